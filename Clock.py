@@ -0,0 +1,70 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+
+class Clock(ABC):
+    """
+    the source of time for the algorithm and the clients, and the way to wait for it to pass.
+
+    calling the clock returns the current time in seconds,
+    so it can be passed anywhere a function returning the time is expected.
+    """
+
+    @abstractmethod
+    def now(self) -> float:
+        """
+        returns the current time in seconds
+        """
+
+    @abstractmethod
+    def sleep(self, duration: float):
+        """
+        waits untill the given number of seconds passed
+        """
+
+    def __call__(self) -> float:
+        return self.now()
+
+
+class WallClock(Clock):
+    """
+    the real monotonic time, which passes on its own
+    """
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, duration: float):
+        time.sleep(duration)
+
+
+class LockstepClock(Clock):
+    """
+    a simulated time, which only passes when it is slept,
+    advancing the simulation by exactly the time that was slept,
+    so the algorithm runs as fast as it can compute, and the same run always gives the same results
+    """
+
+    step: Optional[Callable[[float], None]]
+    """
+    advances the simulation by the given number of seconds, and returns once it did,
+    or None if the simulation follows the clock on its own
+    """
+
+    def __init__(self, start: float = 0, step: Optional[Callable[[float], None]] = None) -> None:
+        self.time = start
+        self.step = step
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep(self, duration: float):
+        if duration <= 0:
+            return
+        if self.step is not None:
+            self.step(duration)
+        self.time += duration
+
+
+WALL_CLOCK = WallClock()
@@ -1,10 +1,179 @@
-import airsim
+try:
+    import airsim
+except ImportError:
+    # airsim is only needed for connecting to the simulator,
+    # the simulated backends can be used without it
+    airsim = None
+
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
 import DroneTypes
+from Clock import WALL_CLOCK, Clock, LockstepClock
+from TickProfiler import StageTimer
+
+
+class Channel:
+    """
+    a connection to the simulator dedicated to one kind of traffic,
+    so slow requests of one kind don't hold back the requests of another behind them.
+
+    the rpc client isn't thread safe, so requests on the same channel are sent one at a time,
+    and the latency of each request is measured, including the time spent waiting for the channel.
+    """
+
+    def __init__(self, name: str, timeout: float, window: int = 500) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.client = airsim.MultirotorClient(timeout_value=timeout)
+        self.lock = threading.Lock()
+        self.latency = StageTimer(window)
+
+    def call(self, method: str, *args, **kwargs):
+        """
+        send the request with the given name of a method of the rpc client,
+        and the given arguments, returning its result
+        """
+        start = time.perf_counter()
+        with self.lock:
+            try:
+                return getattr(self.client, method)(*args, **kwargs)
+            finally:
+                self.latency.record(time.perf_counter() - start)
+
+
+class CommandCoalescer:
+    """
+    decides which flight commands are worth sending to the drone,
+    skipping commands which are nearly the same as the one that was sent last,
+    and commands that come too soon after it.
+
+    each command replaces the previous one entirely, so a command skipped for being similar is never needed later.
+    a command that came too soon is held back instead, and is sent once the interval passes,
+    unless a later command replaces it first, so the next command that is sent carries the latest target.
+    commands that stop the drone are never held back.
+    """
+
+    position_tolerance: float = 0.5
+    """
+    how far in meters the target of a command can be from the target that was sent last, to be skipped
+    """
+
+    velocity_tolerance: float = 0.25
+    """
+    how different in meters per second the velocity of a command can be from the one that was sent last, to be skipped
+    """
+
+    refresh_interval: float = 0.5
+    """
+    the time in seconds after which a command is sent even if it is nearly the same as the one that was sent last
+    """
+
+    min_resend_interval: float = 0.05
+    """
+    the minimal interval in seconds between sending commands, no matter how different they are
+    """
+
+    stop_velocity: float = 0.001
+    """
+    the velocity in meters per second, at or below which a command stops the drone
+    """
+
+    last_command: Optional[Tuple[float, float, float, float]]
+    """
+    the target position and velocity of the command that was sent last, if any
+    """
+
+    pending: Optional[Tuple[float, float, float, float]]
+    """
+    the latest command that was held back for coming too soon after the one that was sent last, if any
+    """
+
+    def __init__(self, clock: Callable[[], float] = WALL_CLOCK) -> None:
+        self.clock = clock
+        self.last_command = None
+        self.pending = None
+        self.last_time = -math.inf
+        self.sent = 0
+        self.skipped = 0
+
+    def accept(self, x: float, y: float, z: float, v: float) -> bool:
+        """
+        returns whether the command should be sent, and if so, counts it as the command that was sent last
+        """
+        now = self.clock()
+        elapsed = now - self.last_time
+        if self.last_command is not None:
+            last_x, last_y, last_z, last_v = self.last_command
+            similar = (math.dist((x, y, z), (last_x, last_y, last_z)) <= self.position_tolerance
+                       and abs(v - last_v) <= self.velocity_tolerance)
+            if similar and elapsed < self.refresh_interval:
+                # the drone is already flying to nearly the same target
+                self.pending = None
+                self.skipped += 1
+                return False
+            if elapsed < self.min_resend_interval and v > self.stop_velocity:
+                self.pending = (x, y, z, v)
+                self.skipped += 1
+                return False
+
+        self.pending = None
+        self.last_command = (x, y, z, v)
+        self.last_time = now
+        self.sent += 1
+        return True
+
+    def due(self, force: bool = False) -> Optional[Tuple[float, float, float, float]]:
+        """
+        returns the command that was held back, if the interval since the command that was sent last passed,
+        or even if it didn't when forced, and counts it as the command that was sent last
+        """
+        if self.pending is None:
+            return None
+        now = self.clock()
+        if not force and now - self.last_time < self.min_resend_interval:
+            return None
+
+        command = self.pending
+        self.pending = None
+        self.last_command = command
+        self.last_time = now
+        self.skipped -= 1
+        self.sent += 1
+        return command
+
+    def reset(self):
+        """
+        forget the command that was sent last, and any command that was held back,
+        so the next command is sent no matter what
+        """
+        self.last_command = None
+        self.pending = None
+        self.last_time = -math.inf
 
 
 class DroneClient:
-    def __init__(self):
-        self.client = airsim.MultirotorClient()
+    command_timeout: float = 2
+    telemetry_timeout: float = 2
+    sensor_timeout: float = 10
+    """
+    how long in seconds to wait for a response on each of the channels,
+    commands and telemetry are small and should be answered quickly, while LIDAR scans can be large
+    """
+
+    def __init__(self, clock: Clock = WALL_CLOCK, vehicle_name: str = ""):
+        self.clock = clock
+        # the name of the vehicle in the airsim settings, the default vehicle if empty
+        self.vehicle_name = vehicle_name
+        # commands to the drone, its pose, and its LIDAR scans each have a connection of their own,
+        # so a large scan doesn't block the next command
+        self.command_channel = Channel("command", self.command_timeout)
+        self.telemetry_channel = Channel("telemetry", self.telemetry_timeout)
+        self.sensor_channel = Channel("sensor", self.sensor_timeout)
+        self.client = self.command_channel.client
+        self.coalescer = CommandCoalescer(clock)
         self.future = None
 
     def __del__(self):
@@ -21,9 +190,10 @@ class DroneClient:
         Returns:
             none
         """
-        self.client.confirmConnection()
-        self.client.enableApiControl(True)
-        self.client.armDisarm(True)
+        for channel in (self.command_channel, self.telemetry_channel, self.sensor_channel):
+            channel.call("confirmConnection")
+        self.command_channel.call("enableApiControl", True, vehicle_name=self.vehicle_name)
+        self.command_channel.call("armDisarm", True, vehicle_name=self.vehicle_name)
 
     def isConnected(self):
         """
@@ -35,7 +205,7 @@ class DroneClient:
         Returns:
             bool: true if connected. otherwise return false
         """
-        return self.client.isApiControlEnabled()
+        return self.telemetry_channel.call("isApiControlEnabled", vehicle_name=self.vehicle_name)
 
     def getPose(self):
         """
@@ -47,7 +217,7 @@ class DroneClient:
         Returns:
             DroneTypes.Pose : the pose of the drone
         """
-        drone_pose = self.client.simGetVehiclePose()
+        drone_pose = self.telemetry_channel.call("simGetVehiclePose", vehicle_name=self.vehicle_name)
         res = DroneTypes.Pose()
 
         res.pos.x_m = drone_pose.position.x_val
@@ -64,7 +234,7 @@ class DroneClient:
 
     def getLidarData(self):
         point_cloud = DroneTypes.PointCloud()
-        lidar_data = self.client.getLidarData()
+        lidar_data = self.sensor_channel.call("getLidarData", vehicle_name=self.vehicle_name)
 
         point_cloud.points = lidar_data.point_cloud
 
@@ -83,8 +253,63 @@ class DroneClient:
         Returns:
             none
         """
-        self.future = self.client.moveToPositionAsync(x, y, z, v, drivetrain=airsim.DrivetrainType.ForwardOnly,
-                                                      yaw_mode=airsim.YawMode(False, 0.0))
+        if self.coalescer.accept(x, y, z, v):
+            self.sendFlyToPosition(x, y, z, v)
+
+    def flushCommands(self, force: bool = False):
+        """
+        Send the latest command to fly to position that was held back for coming too soon after the previous one,
+        once enough time passed since the previous one
+
+        Args:
+            force : bool - send it right away, such as when the flight ends
+
+        Returns:
+            none
+        """
+        command = self.coalescer.due(force)
+        if command is not None:
+            self.sendFlyToPosition(*command)
+
+    def sendFlyToPosition(self, x: float, y: float, z: float, v: float):
+        """
+        Send the command to fly to position, without checking if it is worth sending
+
+        Args:
+            x : float - x coordinate
+            y : float - y coordinate
+            z : float - z coordinate
+            v : float - the velocity which the drone fly to position
+
+        Returns:
+            none
+        """
+        self.future = self.command_channel.call("moveToPositionAsync", x, y, z, v,
+                                                drivetrain=airsim.DrivetrainType.ForwardOnly,
+                                                yaw_mode=airsim.YawMode(False, 0.0),
+                                                vehicle_name=self.vehicle_name)
+
+    def flyWithVelocity(self, vx: float, vy: float, z: float, duration: float):
+        """
+        Fly the drone at a velocity on the horizontal plane, at a fixed height,
+        facing the direction it flies in
+
+        Args:
+            vx : float - the velocity along the x axis
+            vy : float - the velocity along the y axis
+            z : float - the z coordinate to keep
+            duration : float - how long in seconds to keep the velocity, before hovering in place
+
+        Returns:
+            none
+        """
+        # the velocity replaces the previous position command,
+        # so the next position command has to be sent, even if it is the same
+        self.coalescer.reset()
+        self.future = self.command_channel.call("moveByVelocityZAsync", vx, vy, z, duration,
+                                                drivetrain=airsim.DrivetrainType.ForwardOnly,
+                                                yaw_mode=airsim.YawMode(False, 0.0),
+                                                vehicle_name=self.vehicle_name)
 
     def setAtPosition(self, x: float, y: float, z: float):
         """
@@ -102,7 +327,8 @@ class DroneClient:
         q = airsim.Quaternionr(1, 0, 0, 0)
         pose = airsim.Pose(pos, q)
 
-        self.client.simSetVehiclePose(pose, True)
+        self.command_channel.call("simSetVehiclePose", pose, True, vehicle_name=self.vehicle_name)
+        self.coalescer.reset()
         self.flyToPosition(x, y, z, 1)
 
     def reset(self):
@@ -115,4 +341,49 @@ class DroneClient:
         Returns:
             none
         """
-        self.client.reset()
+        # resets every vehicle in the simulation, not just this one
+        self.command_channel.call("reset")
+        self.coalescer.reset()
+
+    def continueForTime(self, duration: float):
+        """
+        Advance the paused simulation by a duration, and wait untill it pauses again
+
+        Args:
+            duration : float - the time in seconds to advance the simulation by
+
+        Returns:
+            none
+        """
+        self.command_channel.call("simContinueForTime", duration)
+        while not self.telemetry_channel.call("simIsPause"):
+            time.sleep(0.001)
+
+    def lockstep(self) -> LockstepClock:
+        """
+        Pause the simulation, so it only advances as the returned clock is slept
+
+        Args:
+            none
+
+        Returns:
+            LockstepClock: the clock to pass to the algorithm, which is also used by the client from now on
+        """
+        self.command_channel.call("simPause", True)
+        self.clock = LockstepClock(step=self.continueForTime)
+        self.coalescer.clock = self.clock
+        self.coalescer.reset()
+        return self.clock
+
+    def latencyStatistics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the latency of the requests on each channel
+
+        Args:
+            none
+
+        Returns:
+            dict: the rolling p50, p99 and max latency in seconds, and the number of requests, by channel name
+        """
+        return {channel.name: channel.latency.statistics()
+                for channel in (self.command_channel, self.telemetry_channel, self.sensor_channel)}
@@ -0,0 +1,71 @@
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from Clock import WALL_CLOCK, Clock
+from DroneClient import DroneClient
+from ObstacleMemory import ObstacleMemory
+from PersistentMap import PersistentMap
+from TangentBug import TangentBug
+from vec2 import Vec2
+
+
+class Fleet:
+    """
+    flies several drones at once, each by a tangent bug of its own, on a thread of its own,
+    sharing the obstacle points all of them detect, so each drone knows of the obstacles the others saw.
+
+    all the drones fly in the same plane, as the obstacles of one plane don't apply to another.
+    the drones should share the wall clock, since a lockstep clock would be advanced by each of them separately.
+    """
+
+    bugs: Dict[str, TangentBug]
+    """
+    the tangent bug flying each drone, by the name of the drone
+    """
+
+    obstacle_points: ObstacleMemory
+    """
+    the obstacle points detected by all of the drones, shared by their tangent bugs
+    """
+
+    def __init__(self, plane: float, obstacle_map: Optional[PersistentMap] = None,
+                 clock: Clock = WALL_CLOCK) -> None:
+        self.plane = plane
+        self.obstacle_map = obstacle_map
+        self.clock = clock
+        self.bugs = {}
+        self.obstacle_points = ObstacleMemory(TangentBug.memory_cell_size, TangentBug.connection_distance)
+
+    def add(self, name: str, client: DroneClient) -> TangentBug:
+        """
+        add a drone to the fleet, returns the tangent bug which flies it
+        """
+        bug = TangentBug(client, self.plane, self.obstacle_map, self.clock, self.obstacle_points)
+        self.bugs[name] = bug
+        return bug
+
+    def fly(self, routes: Dict[str, List[Vec2]]) -> Dict[str, Optional[Exception]]:
+        """
+        fly the drones at the same time, each through its route, finding a taxicab path to each of its positions in turn,
+        without stopping untill the last one.
+        returns the error which stopped each drone, or None for the drones which completed their routes
+        """
+        errors: Dict[str, Optional[Exception]] = {}
+
+        def flyRoute(name: str, route: List[Vec2]):
+            try:
+                self.bugs[name].flyMission(route)
+            except Exception as e:
+                logging.exception(f"drone {name} failed its route")
+                errors[name] = e
+            else:
+                errors[name] = None
+
+        threads = [threading.Thread(target=flyRoute, args=(name, route), name=f"drone {name}")
+                   for name, route in routes.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
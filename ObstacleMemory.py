@@ -0,0 +1,387 @@
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, Generator, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from vec2 import Vec2
+
+Cell = Tuple[int, int]
+
+
+class ObstacleClusters:
+    """
+    groups points into clusters, such that two points are in the same cluster,
+    if they are connected through a chain of points, each closer than the connection distance to the next,
+    and keeps the clusters up to date as points are added and removed.
+
+    the points are grouped into link cells small enough that all the points in a cell are connected,
+    so the union-find is over the cells rather than the points,
+    and adding a point to an occupied cell rarely needs any work.
+    """
+
+    connection_distance: float
+    """
+    how far two points can be from each other to be directly connected
+    """
+
+    cells: Dict[Cell, Set[Vec2]]
+    """
+    the points in each non empty link cell
+    """
+
+    labels: Dict[Cell, int]
+    """
+    the label of the cluster each non empty link cell belongs to
+    """
+
+    members: Dict[int, Set[Cell]]
+    """
+    the link cells in each cluster
+    """
+
+    split_clusters: Set[int]
+    """
+    clusters that lost points since they were formed, and might have to be split,
+    which is done only when their labels are needed
+    """
+
+    def __init__(self, connection_distance: float) -> None:
+        self.connection_distance = connection_distance
+        # the diagonal of each cell is the connection distance
+        self.cell_size = connection_distance / math.sqrt(2)
+        self.cells = {}
+        self.labels = {}
+        self.members = {}
+        self.split_clusters = set()
+        self.next_label = 0
+
+        # the offsets of the cells that can contain points connected to a point in a given cell
+        reach = math.ceil(connection_distance / self.cell_size)
+        self.neighbour_offsets = [(dx, dy)
+                                  for dx in range(-reach, reach + 1)
+                                  for dy in range(-reach, reach + 1)
+                                  if (dx, dy) != (0, 0) and
+                                  math.hypot(max(abs(dx) - 1, 0), max(abs(dy) - 1, 0)) * self.cell_size
+                                  <= connection_distance]
+
+    def cellOf(self, point: Vec2) -> Cell:
+        return math.floor(point.x / self.cell_size), math.floor(point.y / self.cell_size)
+
+    def neighbourCells(self, cell: Cell) -> Generator[Cell, None, None]:
+        """
+        yields the non empty cells that may contain points connected to points in the given cell
+        """
+        x, y = cell
+        for dx, dy in self.neighbour_offsets:
+            neighbour = (x + dx, y + dy)
+            if neighbour in self.cells:
+                yield neighbour
+
+    def linked(self, points: Iterable[Vec2], cell: Cell) -> bool:
+        """
+        returns whether any of the given points is connected to a point in the cell
+        """
+        others = self.cells[cell]
+        return any(p.distance(q) <= self.connection_distance for p in points for q in others)
+
+    def newCluster(self, cells: Set[Cell]) -> int:
+        label = self.next_label
+        self.next_label += 1
+        self.members[label] = cells
+        for cell in cells:
+            self.labels[cell] = label
+        return label
+
+    def merge(self, a: int, b: int) -> int:
+        """
+        merge two clusters, moving the smaller one into the larger one,
+        and return the label of the merged cluster
+        """
+        if len(self.members[a]) < len(self.members[b]):
+            a, b = b, a
+
+        moved = self.members.pop(b)
+        for cell in moved:
+            self.labels[cell] = a
+        self.members[a].update(moved)
+
+        if b in self.split_clusters:
+            self.split_clusters.discard(b)
+            self.split_clusters.add(a)
+        return a
+
+    def add(self, point: Vec2):
+        cell = self.cellOf(point)
+        points = self.cells.get(cell)
+        if points is None:
+            self.cells[cell] = {point}
+            self.newCluster({cell})
+        else:
+            points.add(point)
+
+        # link the cell with the neighbouring cells of other clusters the point is connected to,
+        # cells of the same cluster are already connected
+        label = self.labels[cell]
+        for neighbour in self.neighbourCells(cell):
+            other = self.labels[neighbour]
+            if other != label and self.linked((point,), neighbour):
+                label = self.merge(label, other)
+
+    def remove(self, point: Vec2):
+        cell = self.cellOf(point)
+        points = self.cells.get(cell)
+        if points is None or point not in points:
+            return
+
+        points.discard(point)
+        label = self.labels[cell]
+        # the neighbouring cells of the cluster, which the point was the only link of the cell to
+        lost_links = sum(1 for neighbour in self.neighbourCells(cell)
+                         if self.labels[neighbour] == label and self.linked((point,), neighbour)
+                         and not (points and self.linked(points, neighbour)))
+        if not points:
+            del self.cells[cell]
+            del self.labels[cell]
+            self.members[label].discard(cell)
+            if not self.members[label]:
+                del self.members[label]
+                self.split_clusters.discard(label)
+                return
+            # a cell linked to a single other cell was at the end of the cluster, which stays connected without it
+            if lost_links <= 1:
+                return
+
+        # the links between the cells are all that connects the cluster,
+        # so it can only fall apart if one of them was lost
+        if lost_links > 0:
+            self.split_clusters.add(label)
+
+    def split(self, label: int):
+        """
+        split a cluster into the parts that are still connected
+        """
+        self.split_clusters.discard(label)
+        remaining = self.members.pop(label)
+
+        while remaining:
+            start = remaining.pop()
+            component = {start}
+            frontier = [start]
+            while frontier:
+                cell = frontier.pop()
+                for neighbour in self.neighbourCells(cell):
+                    if neighbour in remaining and self.linked(self.cells[cell], neighbour):
+                        remaining.discard(neighbour)
+                        component.add(neighbour)
+                        frontier.append(neighbour)
+            self.newCluster(component)
+
+    def label(self, point: Vec2) -> int:
+        """
+        returns the label of the cluster containing the point
+        """
+        label = self.labels[self.cellOf(point)]
+        if label in self.split_clusters:
+            self.split(label)
+            label = self.labels[self.cellOf(point)]
+        return label
+
+    def labelPoints(self, points: List[Vec2]) -> np.ndarray:
+        """
+        returns the labels of the clusters containing each of the points,
+        only splitting the clusters of the given points when needed.
+
+        points that were removed since, by another drone sharing the memory,
+        each get a negative label of their own
+        """
+        cells = [self.cellOf(p) for p in points]
+        for label in self.split_clusters.intersection(self.labels[c] for c in cells if c in self.labels):
+            if label in self.split_clusters:
+                self.split(label)
+        return np.array([self.labels.get(c, -1 - i) for i, c in enumerate(cells)], dtype=np.int64)
+
+
+class ObstacleMemory:
+    """
+    the obstacle points remembered by the drone, in world frame,
+    with the time, in seconds, at which each point was last spotted.
+
+    the points are bucketed into a uniform grid of square cells,
+    so that finding the points around a position only touches the cells near it,
+    regardless of how much of the map was already seen.
+    """
+
+    cell_size: float
+    """
+    the length of the side of each cell in the grid
+    """
+
+    cells: Dict[Cell, Dict[Vec2, float]]
+    """
+    the points in each non empty cell of the grid, keyed by the index of the cell
+    """
+
+    sightings: Deque[Tuple[float, List[Vec2]]]
+    """
+    the points spotted at each time, ordered from the oldest time to the newest.
+    a point spotted again also stays in its older buckets,
+    which are ignored once the point turns out to have been spotted since.
+    """
+
+    clusters: Optional[ObstacleClusters]
+    """
+    the clusters of connected points, if the points should be clustered
+    """
+
+    lock: threading.RLock
+    """
+    held by each drone sharing the memory with others, around every group of changes and queries it makes,
+    the memory itself doesn't lock
+    """
+
+    def __init__(self, cell_size: float = 16, connection_distance: Optional[float] = None) -> None:
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        self.sightings = deque()
+        self.lock = threading.RLock()
+        self.clusters = None if connection_distance is None \
+            else ObstacleClusters(connection_distance)
+
+    def cellOf(self, point: Vec2) -> Cell:
+        """
+        returns the index of the cell containing the given point
+        """
+        return math.floor(point.x / self.cell_size), math.floor(point.y / self.cell_size)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, point: Vec2) -> bool:
+        cell = self.cells.get(self.cellOf(point))
+        return cell is not None and point in cell
+
+    def __iter__(self) -> Generator[Vec2, None, None]:
+        for cell in self.cells.values():
+            yield from cell
+
+    def __getitem__(self, point: Vec2) -> float:
+        cell = self.cells.get(self.cellOf(point))
+        if cell is None:
+            raise KeyError(point)
+        return cell[point]
+
+    def __setitem__(self, point: Vec2, value: float):
+        cell = self.cells.setdefault(self.cellOf(point), {})
+        if point not in cell:
+            self.size += 1
+            cell[point] = value
+            if self.clusters is not None:
+                self.clusters.add(point)
+        else:
+            cell[point] = value
+
+    def keys(self) -> Generator[Vec2, None, None]:
+        return iter(self)
+
+    def items(self) -> Generator[Tuple[Vec2, float], None, None]:
+        for cell in self.cells.values():
+            yield from cell.items()
+
+    def pop(self, point: Vec2, default: Optional[float] = None) -> Optional[float]:
+        index = self.cellOf(point)
+        cell = self.cells.get(index)
+        if cell is None or point not in cell:
+            return default
+
+        self.size -= 1
+        value = cell.pop(point)
+        if self.clusters is not None:
+            self.clusters.remove(point)
+        if not cell:
+            # drop empty cells, so queries over areas seen long ago stay cheap
+            del self.cells[index]
+        return value
+
+    def cellsAround(self, center: Vec2, radius: float) -> Generator[Tuple[Dict[Vec2, float], bool], None, None]:
+        """
+        yields the cells overlapping the disc with the given center and radius,
+        together with whether the cell is entirely inside the disc
+        """
+        min_x, min_y = self.cellOf(center - Vec2(radius, radius))
+        max_x, max_y = self.cellOf(center + Vec2(radius, radius))
+
+        for cx in range(min_x, max_x + 1):
+            # the span of the cell on the x axis
+            left = cx * self.cell_size
+            right = left + self.cell_size
+            near_x = min(max(center.x, left), right) - center.x
+            far_x = max(abs(left - center.x), abs(right - center.x))
+
+            for cy in range(min_y, max_y + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    continue
+
+                bottom = cy * self.cell_size
+                top = bottom + self.cell_size
+                near_y = min(max(center.y, bottom), top) - center.y
+                if near_x * near_x + near_y * near_y >= radius * radius:
+                    # even the closest point of the cell is outside the disc
+                    continue
+
+                far_y = max(abs(bottom - center.y), abs(top - center.y))
+                yield cell, far_x * far_x + far_y * far_y < radius * radius
+
+    def query(self, center: Vec2, radius: float) -> List[Vec2]:
+        """
+        returns the points closer than the radius to the given center
+        """
+        points: List[Vec2] = []
+        for cell, inside in self.cellsAround(center, radius):
+            if inside:
+                points.extend(cell)
+            else:
+                points.extend(p for p in cell if p.distance(center) < radius)
+        return points
+
+    def refresh(self, points: Iterable[Vec2], time: float):
+        """
+        mark the points as spotted at the given time, adding the ones that weren't remembered yet.
+        times should not decrease between calls.
+        """
+        if self.sightings and time < self.sightings[-1][0]:
+            # spotted by a drone sharing the memory, which measured slightly before the latest one,
+            # count them as spotted with the latest points, to keep the buckets in order
+            time = self.sightings[-1][0]
+        if not self.sightings or self.sightings[-1][0] != time:
+            self.sightings.append((time, []))
+        bucket = self.sightings[-1][1]
+
+        for point in points:
+            self[point] = time
+            bucket.append(point)
+
+    def forget(self, before: float) -> List[Vec2]:
+        """
+        remove the points that were last spotted before the given time,
+        only going over the points that were spotted at those times.
+        returns the removed points.
+        """
+        forgotten = []
+        while self.sightings and self.sightings[0][0] < before:
+            time, bucket = self.sightings.popleft()
+            for point in bucket:
+                # points spotted since then have a newer time, and stay
+                if self.get(point) == time:
+                    self.pop(point)
+                    forgotten.append(point)
+        return forgotten
+
+    def get(self, point: Vec2, default: Optional[float] = None) -> Optional[float]:
+        cell = self.cells.get(self.cellOf(point))
+        if cell is None:
+            return default
+        return cell.get(point, default)
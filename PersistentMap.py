@@ -0,0 +1,234 @@
+import math
+import os
+import struct
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from vec2 import Vec2
+
+Tile = Tuple[int, int]
+
+# the layout of the file:
+# a header, an index with the position and offset of each tile,
+# followed by the tiles, each a square of hit counts, one byte per cell
+# the header holds the magic, the tile size, the number of tiles and the plane, which is a double so it reads back exactly
+HEADER = struct.Struct("<8sIIdQ")
+MAGIC = b"OBSTMAP2"
+INDEX_DTYPE = np.dtype([("x", "<i4"), ("y", "<i4"), ("offset", "<i8")])
+
+
+class PersistentMap:
+    """
+    a long lived occupancy grid of the obstacles in a single plane,
+    kept between missions in a file, with a cell for each point on the grid of rounded obstacle points.
+
+    the grid is split into square tiles, and the file is memory mapped,
+    so only the tiles around the drone are actually read, once they are needed.
+
+    the hit counts saturate at a few times the hits needed for a cell to be occupied,
+    and each time the map is saved, the cells around the drone that weren't detected since it was opened lose hits,
+    so obstacles that were removed are eventually forgotten, after a bounded number of missions that didn't see them.
+    """
+
+    path: str
+    """
+    the file the map is stored in
+    """
+
+    plane: float
+    """
+    the z coordinate of the plane the map describes
+    """
+
+    tile_size: int
+    """
+    the number of cells along each side of a tile
+    """
+
+    occupied_hits: int
+    """
+    how many iterations a cell has to be detected in, before it is considered occupied,
+    to ignore points that were detected only momentarily
+    """
+
+    max_hits: int
+    """
+    the most hits a cell can have, so a cell that stops being detected is forgotten after a bounded number of missions
+    """
+
+    decay: int
+    """
+    how many hits are taken from each cell that was around the drone but wasn't detected, each time the map is saved
+    """
+
+    tiles: Dict[Tile, np.ndarray]
+    """
+    the tiles that were already loaded, either views of the file, or modified copies of them
+    """
+
+    def __init__(self, path: str, plane: float, tile_size: int = 64, occupied_hits: int = 3,
+                 max_hits: int = 12, decay: int = 1) -> None:
+        self.path = path
+        self.plane = plane
+        self.tile_size = tile_size
+        self.occupied_hits = occupied_hits
+        self.max_hits = max_hits
+        self.decay = decay
+        self.tiles = {}
+        self.modified = set()
+        # the cells of each tile which were detected, and which were around the drone, since the map was opened
+        self.marked: Dict[Tile, np.ndarray] = {}
+        self.observed: Dict[Tile, np.ndarray] = {}
+        self.file: Optional[np.memmap] = None
+        self.offsets: Dict[Tile, int] = {}
+        self.open()
+
+    def open(self):
+        """
+        memory map the file of the map, if it exists, and read its index
+        """
+        self.tiles = {}
+        self.modified = set()
+        self.marked = {}
+        self.observed = {}
+        self.offsets = {}
+        self.file = None
+        if not os.path.exists(self.path):
+            return
+
+        self.file = np.memmap(self.path, dtype=np.uint8, mode="r")
+        magic, tile_size, count, plane, _ = HEADER.unpack(
+            self.file[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an obstacle map")
+        if tile_size != self.tile_size or not math.isclose(plane, self.plane):
+            raise ValueError(f"{self.path} is a map of tiles of size {tile_size} at plane {plane}, "
+                             f"expected tiles of size {self.tile_size} at plane {self.plane}")
+
+        index = np.frombuffer(self.file, dtype=INDEX_DTYPE, count=count, offset=HEADER.size)
+        self.offsets = {(int(x), int(y)): int(offset) for x, y, offset in index.tolist()}
+
+    def tileOf(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return np.floor_divide(x, self.tile_size), np.floor_divide(y, self.tile_size)
+
+    def getTile(self, tile: Tile, create: bool = False) -> Optional[np.ndarray]:
+        """
+        returns the hit counts of the cells in the tile, indexed by [x, y] relative to the corner of the tile,
+        loading it from the file the first time it is needed.
+        if the tile is going to be modified, a writable copy is returned, and created if missing.
+        """
+        cells = self.tiles.get(tile)
+        if cells is None:
+            offset = self.offsets.get(tile)
+            if offset is not None:
+                assert self.file is not None
+                cells = self.file[offset:offset + self.tile_size * self.tile_size]\
+                    .reshape(self.tile_size, self.tile_size)
+            elif create:
+                cells = np.zeros((self.tile_size, self.tile_size), dtype=np.uint8)
+                self.modified.add(tile)
+            else:
+                return None
+            self.tiles[tile] = cells
+
+        if create and tile not in self.modified:
+            # the tile is a read only view of the file
+            cells = np.array(cells)
+            self.tiles[tile] = cells
+            self.modified.add(tile)
+        return cells
+
+    def mark(self, points: np.ndarray):
+        """
+        record that the given (N, 2) array of rounded points were detected on obstacles in this iteration
+        """
+        if len(points) == 0:
+            return
+        points = np.unique(points, axis=0)
+        tile_x, tile_y = self.tileOf(points[:, 0], points[:, 1])
+        tiles = np.unique(np.stack((tile_x, tile_y), axis=1), axis=0)
+
+        for tx, ty in tiles.tolist():
+            in_tile = (tile_x == tx) & (tile_y == ty)
+            cells = self.getTile((tx, ty), create=True)
+            assert cells is not None
+            x = points[in_tile, 0] - tx * self.tile_size
+            y = points[in_tile, 1] - ty * self.tile_size
+            cells[x, y] = np.minimum(cells[x, y].astype(np.uint16) + 1, self.max_hits)
+            self.marked.setdefault((tx, ty), np.zeros_like(cells, dtype=bool))[x, y] = True
+
+    def query(self, center: Vec2, radius: float) -> np.ndarray:
+        """
+        returns an (N, 2) integer array of the occupied cells closer than the radius to the given center
+        """
+        min_x, min_y = self.tileOf(np.array(math.floor(center.x - radius)),
+                                   np.array(math.floor(center.y - radius)))
+        max_x, max_y = self.tileOf(np.array(math.ceil(center.x + radius)),
+                                   np.array(math.ceil(center.y + radius)))
+
+        found = []
+        for tx in range(int(min_x), int(max_x) + 1):
+            for ty in range(int(min_y), int(max_y) + 1):
+                cells = self.getTile((tx, ty))
+                if cells is None:
+                    continue
+                xs = np.arange(self.tile_size) + tx * self.tile_size
+                ys = np.arange(self.tile_size) + ty * self.tile_size
+                near = np.hypot(xs[:, None] - center.x, ys[None, :] - center.y) < radius
+                observed = self.observed.get((tx, ty))
+                if observed is None:
+                    self.observed[(tx, ty)] = near
+                else:
+                    observed |= near
+
+                x, y = np.nonzero((cells >= self.occupied_hits) & near)
+                found.append(np.stack((x + tx * self.tile_size, y + ty * self.tile_size), axis=1))
+
+        if not found:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.concatenate(found).astype(np.int64)
+
+    def save(self):
+        """
+        write the map back to its file, including all of the tiles modified since it was opened,
+        after taking hits from the cells around the drone which weren't detected since then
+        """
+        for tile, observed in self.observed.items():
+            marked = self.marked.get(tile)
+            missed = observed if marked is None else observed & ~marked
+            cells = self.getTile(tile)
+            if cells is None or not np.any(cells[missed]):
+                continue
+            cells = self.getTile(tile, create=True)
+            assert cells is not None
+            cells[missed] = np.maximum(cells[missed].astype(np.int16) - self.decay, 0)
+
+        if not self.modified:
+            return
+
+        tiles = sorted(set(self.offsets) | self.modified)
+        tile_bytes = self.tile_size * self.tile_size
+        first_offset = HEADER.size + len(tiles) * INDEX_DTYPE.itemsize
+
+        index = np.zeros(len(tiles), dtype=INDEX_DTYPE)
+        for i, (tx, ty) in enumerate(tiles):
+            index[i] = (tx, ty, first_offset + i * tile_bytes)
+
+        # write to a new file, and replace the old one only once it is complete,
+        # so a failure while writing doesn't lose the previous map
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.tile_size, len(tiles), self.plane, 0))
+            f.write(index.tobytes())
+            for tile in tiles:
+                cells = self.getTile(tile)
+                assert cells is not None
+                # maps saved before the counts were capped are capped as they are saved
+                f.write(np.minimum(cells, self.max_hits).astype(np.uint8).tobytes())
+
+        # the file can't be replaced while it is still mapped on some platforms
+        self.tiles = {}
+        self.file = None
+        os.replace(temp_path, self.path)
+        self.open()
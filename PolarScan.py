@@ -0,0 +1,120 @@
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from vec2 import Vec2Array
+
+
+def wrapAngles(angles: np.ndarray) -> np.ndarray:
+    """
+    wrap the angles, given in radians, to the range [-pi, pi)
+    """
+    return (angles + math.pi) % (2 * math.pi) - math.pi
+
+
+class PolarScan:
+    """
+    the points around the drone, in body frame, binned by their angle around it,
+    like the scan of a range sensor, with the closest point in each bin.
+
+    the angle and range of every point are found once when the scan is built,
+    so the angular queries of each iteration only go over the bins,
+    and the few points in the bins they can't decide on as a whole.
+    """
+
+    bin_count: int
+    """
+    the number of bins, each covering an equal arc of the circle around the drone
+    """
+
+    angles: np.ndarray
+    ranges: np.ndarray
+    """
+    the angle in radians, and the distance from the drone, of each point
+    """
+
+    bins: np.ndarray
+    """
+    the bin of each point
+    """
+
+    min_ranges: np.ndarray
+    closest: np.ndarray
+    """
+    the distance to the closest point in each bin, and the index of that point,
+    infinity and -1 for empty bins
+    """
+
+    def __init__(self, points: Vec2Array, bin_count: int = 360) -> None:
+        self.bin_count = bin_count
+        self.bin_width = 2 * math.pi / bin_count
+        self.angles = np.arctan2(points.y, points.x)
+        self.ranges = points.length()
+        self.bins = np.minimum(((self.angles + math.pi) / self.bin_width).astype(np.int64), bin_count - 1)
+
+        # the points ordered by their bin, and by their range within each bin
+        self.order = np.lexsort((self.ranges, self.bins))
+        self.starts = np.searchsorted(self.bins[self.order], np.arange(bin_count + 1))
+        counts = np.diff(self.starts)
+
+        self.closest = np.full(bin_count, -1, dtype=np.int64)
+        self.min_ranges = np.full(bin_count, math.inf)
+        occupied = counts > 0
+        self.closest[occupied] = self.order[self.starts[:-1][occupied]]
+        self.min_ranges[occupied] = self.ranges[self.closest[occupied]]
+
+    def __len__(self) -> int:
+        return len(self.angles)
+
+    def pointsInBin(self, index: int) -> np.ndarray:
+        """
+        returns the indices of the points in the bin, from the closest to the furthest
+        """
+        return self.order[self.starts[index]:self.starts[index + 1]]
+
+    def closestPoint(self) -> Optional[int]:
+        """
+        returns the index of the closest point to the drone, or None if there are no points
+        """
+        if len(self) == 0:
+            return None
+        # among points at the same range, the first one, like argmin over the points
+        tied = self.min_ranges == self.min_ranges.min()
+        return int(self.closest[tied].min())
+
+    def closestOpposing(self, index: int) -> float:
+        """
+        returns the distance to the closest point more than a quarter of a circle away from the given point,
+        in the angle around the drone, or infinity if there is none
+        """
+        # the difference in angle between any point in a bin and the given point is within a bin of the distance between the bins
+        offsets = np.abs(np.arange(self.bin_count) - self.bins[index])
+        offsets = np.minimum(offsets, self.bin_count - offsets)
+        surely_opposing = (offsets - 1) * self.bin_width > math.pi / 2
+        undecided = ~surely_opposing & ((offsets + 1) * self.bin_width > math.pi / 2)
+
+        distance = self.min_ranges[surely_opposing].min(initial=math.inf)
+        for bin_index in np.flatnonzero(undecided & (self.closest >= 0)):
+            points = self.pointsInBin(bin_index)
+            opposing = np.abs(wrapAngles(self.angles[points] - self.angles[index])) > math.pi / 2
+            distance = min(distance, self.ranges[points][opposing].min(initial=math.inf))
+        return distance
+
+    def extremeAngles(self, mask: np.ndarray, reference: float) -> Tuple[int, int]:
+        """
+        returns the indices of the points in the mask with the smallest and largest angle relative to the reference angle,
+        which must contain at least one point
+        """
+        indices = np.flatnonzero(mask)
+        relative = wrapAngles(self.angles[indices] - reference)
+        return int(indices[np.argmin(relative)]), int(indices[np.argmax(relative)])
+
+    def rangeProfile(self) -> List[Tuple[float, float]]:
+        """
+        returns the angle at the middle of each occupied bin, with the distance to the closest point in it,
+        for debugging
+        """
+        occupied = np.flatnonzero(self.closest >= 0)
+        middles = (occupied + 0.5) * self.bin_width - math.pi
+        return list(zip(middles.tolist(), self.min_ranges[occupied].tolist()))
@@ -0,0 +1,264 @@
+import heapq
+import itertools
+import math
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from Clock import WALL_CLOCK
+from vec2 import Vec2
+
+# an intersection on the grid of roads, by the number of steps along the x and y axes from the known waypoint
+Waypoint = Tuple[int, int]
+# a road between two neighbouring intersections, with the smaller intersection first
+Edge = Tuple[Waypoint, Waypoint]
+# an intersection during the search, with the step along the grid the route arrived at it by, if any
+Heading = Optional[Tuple[int, int]]
+State = Tuple[Waypoint, Heading]
+
+
+def edgeOf(a: Waypoint, b: Waypoint) -> Edge:
+    return (a, b) if a <= b else (b, a)
+
+
+class RoadGraph:
+    """
+    the grid of roads between the intersections around the known waypoint,
+    searched with A* for the fastest route between two intersections.
+
+    the time it takes to fly along each road is learned from the flights along it,
+    and roads that took far longer than expected are considered blocked for a while.
+    every turn costs extra time, since the drone stops at the end of each straight leg.
+    routes are cached by the intersections they connect, untill the roads they use change.
+    """
+
+    free_speed: float
+    """
+    the velocity in meters per second along roads that weren't flown yet
+    """
+
+    max_speed: float
+    """
+    the highest velocity in meters per second along any road, so the heuristic of the search never overestimates
+    """
+
+    learning_rate: float = 0.5
+    """
+    how much each flight along a road moves the learned time of the road towards the time of that flight
+    """
+
+    blocked_slowdown: float = 3
+    """
+    how many times longer than expected a flight along a road should take, for the road to be considered blocked
+    """
+
+    block_duration: float = 300
+    """
+    how long in seconds a road is considered blocked, before it is tried again
+    """
+
+    replan_threshold: float = 0.25
+    """
+    how much the learned time of a road can change relative to its time when the cached routes were found,
+    before the routes are found again
+    """
+
+    turn_cost: float = 5
+    """
+    the time in seconds lost by turning at an intersection, to stop at the end of a straight leg and speed up again
+    """
+
+    search_margin: int = 2
+    """
+    how many intersections beyond the start and the end a route can go around through
+    """
+
+    def __init__(self, known_waypoint: Vec2, grid_x_interval: float, grid_y_interval: float,
+                 free_speed: float, max_speed: float, cache_size: int = 128,
+                 clock: Callable[[], float] = WALL_CLOCK) -> None:
+        self.known_waypoint = known_waypoint
+        self.grid_x_interval = grid_x_interval
+        self.grid_y_interval = grid_y_interval
+        self.free_speed = free_speed
+        self.max_speed = max_speed
+        self.cache_size = cache_size
+        self.clock = clock
+
+        self.travel_times: Dict[Edge, float] = {}
+        self.blocked_until: Dict[Edge, float] = {}
+        self.routes: "OrderedDict[Tuple[Waypoint, Waypoint], List[Waypoint]]" = OrderedDict()
+        # the times of the roads when the cached routes were found
+        self.planned_times: Dict[Edge, float] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def nearest(self, point: Vec2) -> Waypoint:
+        """
+        returns the intersection nearest to the point in world frame
+        """
+        relative = point - self.known_waypoint
+        return round(relative.x / self.grid_x_interval), round(relative.y / self.grid_y_interval)
+
+    def position(self, waypoint: Waypoint) -> Vec2:
+        """
+        returns the position of the intersection in world frame
+        """
+        return Vec2(waypoint[0] * self.grid_x_interval, waypoint[1] * self.grid_y_interval) + self.known_waypoint
+
+    def length(self, edge: Edge) -> float:
+        a, b = edge
+        return abs(a[0] - b[0]) * self.grid_x_interval + abs(a[1] - b[1]) * self.grid_y_interval
+
+    def isBlocked(self, edge: Edge) -> bool:
+        until = self.blocked_until.get(edge)
+        if until is None:
+            return False
+        if self.clock() >= until:
+            del self.blocked_until[edge]
+            return False
+        return True
+
+    def cost(self, edge: Edge) -> float:
+        """
+        returns the time in seconds it is expected to take to fly along the road
+        """
+        learned = self.travel_times.get(edge)
+        if learned is not None:
+            return learned
+        return self.length(edge) / self.free_speed
+
+    def neighbours(self, waypoint: Waypoint) -> Iterable[Waypoint]:
+        x, y = waypoint
+        return (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)
+
+    def heuristic(self, a: Waypoint, b: Waypoint) -> float:
+        return self.length((a, b)) / self.max_speed
+
+    def search(self, start: Waypoint, end: Waypoint) -> Optional[List[Waypoint]]:
+        """
+        find the fastest route from the start to the end with A*, including the time lost at its turns,
+        returns the intersections along it including both, or None if every route is blocked.
+
+        the intersections are searched together with the direction the route arrived at them in,
+        so turns can be counted. between routes that are as fast, the one going along the x axis first is found,
+        like the routes that turn once at the corner, which were flown before the times were learned.
+        """
+        min_x = min(start[0], end[0]) - self.search_margin
+        max_x = max(start[0], end[0]) + self.search_margin
+        min_y = min(start[1], end[1]) - self.search_margin
+        max_y = max(start[1], end[1]) + self.search_margin
+
+        initial: State = (start, None)
+        costs = {initial: 0.0}
+        previous: Dict[State, State] = {}
+        # whether each route started along the y axis, to break ties
+        y_first: Dict[State, bool] = {initial: False}
+        # the order the states were found in, so the heap never compares states
+        counter = itertools.count()
+        frontier = [(self.heuristic(start, end), False, next(counter), initial)]
+        while frontier:
+            _, _, _, state = heapq.heappop(frontier)
+            waypoint, heading = state
+            if waypoint == end:
+                route = [end]
+                while state != initial:
+                    state = previous[state]
+                    route.append(state[0])
+                return route[::-1]
+
+            for neighbour in self.neighbours(waypoint):
+                if not (min_x <= neighbour[0] <= max_x and min_y <= neighbour[1] <= max_y):
+                    continue
+                edge = edgeOf(waypoint, neighbour)
+                if self.isBlocked(edge):
+                    continue
+                step = (neighbour[0] - waypoint[0], neighbour[1] - waypoint[1])
+                cost = costs[state] + self.cost(edge)
+                if heading is not None and step != heading:
+                    cost += self.turn_cost
+                next_state = (neighbour, step)
+                if cost < costs.get(next_state, math.inf):
+                    costs[next_state] = cost
+                    previous[next_state] = state
+                    y_first[next_state] = y_first[state] if heading is not None else step[1] != 0
+                    # the estimates are rounded, so routes that are as fast up to the rounding errors of their sums,
+                    # are ordered by the axis they started along
+                    estimate = round(cost + self.heuristic(neighbour, end), 6)
+                    heapq.heappush(frontier, (estimate, y_first[next_state], next(counter), next_state))
+        return None
+
+    def route(self, start: Waypoint, end: Waypoint) -> Optional[List[Waypoint]]:
+        """
+        returns the fastest route from the start to the end, from the cache if it was already found,
+        as the intersections along it including both, or None if every route is blocked
+        """
+        key = (start, end)
+        route = self.routes.get(key)
+        if route is not None:
+            self.routes.move_to_end(key)
+            self.cache_hits += 1
+            return route
+
+        self.cache_misses += 1
+        route = self.search(start, end)
+        if route is not None:
+            self.routes[key] = route
+            for edge in self.edges(route):
+                self.planned_times[edge] = self.cost(edge)
+            if len(self.routes) > self.cache_size:
+                self.routes.popitem(last=False)
+        return route
+
+    def edges(self, route: List[Waypoint]) -> List[Edge]:
+        return [edgeOf(a, b) for a, b in zip(route, route[1:])]
+
+    def legs(self, route: List[Waypoint]) -> List[List[Waypoint]]:
+        """
+        split the route into straight legs, each with the intersections along it,
+        so the drone can fly through the intersections in the middle of a leg without turning
+        """
+        legs = [route[:2]]
+        for waypoint in route[2:]:
+            leg = legs[-1]
+            direction = (leg[1][0] - leg[0][0], leg[1][1] - leg[0][1])
+            step = (waypoint[0] - leg[-1][0], waypoint[1] - leg[-1][1])
+            if step == direction:
+                leg.append(waypoint)
+            else:
+                legs.append([leg[-1], waypoint])
+        return legs
+
+    def record(self, leg: List[Waypoint], duration: float):
+        """
+        learn from a flight along the straight leg, which took the given time in seconds,
+        blocking its roads if it took far longer than expected
+        """
+        edges = self.edges(leg)
+        expected = sum(self.cost(edge) for edge in edges)
+        if expected <= 0:
+            return
+        # the time is split between the roads of the leg by their expected times
+        for edge in edges:
+            share = duration * self.cost(edge) / expected
+            learned = self.travel_times.get(edge)
+            self.travel_times[edge] = share if learned is None \
+                else learned + self.learning_rate * (share - learned)
+
+        if duration > self.blocked_slowdown * expected:
+            until = self.clock() + self.block_duration
+            for edge in edges:
+                self.blocked_until[edge] = until
+            self.invalidate()
+            return
+
+        for edge in edges:
+            planned = self.planned_times.get(edge)
+            if planned is not None and abs(self.cost(edge) - planned) > self.replan_threshold * planned:
+                self.invalidate()
+                return
+
+    def invalidate(self):
+        """
+        forget the cached routes, so they are found again with the latest times of the roads
+        """
+        self.routes.clear()
+        self.planned_times.clear()
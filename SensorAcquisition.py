@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+import DroneTypes
+from DroneClient import DroneClient
+
+
+class SensorFrame(NamedTuple):
+    """
+    a pose of the drone and the LIDAR point cloud measured right after it
+    """
+
+    seq: int
+    """
+    the number of the frame, counting up from 1, which skips frames that were replaced before being read
+    """
+
+    timestamp: float
+    """
+    the time in seconds, by the clock of the acquisition, at which the point cloud was received
+    """
+
+    pose: DroneTypes.Pose
+    point_cloud: DroneTypes.PointCloud
+
+
+class SensorAcquisition:
+    """
+    keeps fetching the pose and the LIDAR data of the drone in a background thread,
+    so the latency of fetching them doesn't add up to the iterations of the algorithm.
+
+    only the newest frame is kept, in a slot which is replaced as a whole whenever a new frame is fetched,
+    so reading it never blocks, and never mixes the pose of one frame with the point cloud of another.
+    the sequence numbers of the frames reveal whether the frame was already read, or if frames were missed.
+    """
+
+    period: float
+    """
+    the minimal interval in seconds between starting to fetch consecutive frames,
+    0 to fetch them as fast as the client can provide them
+    """
+
+    frame: Optional[SensorFrame]
+    """
+    the newest frame, or None if none was fetched yet
+    """
+
+    def __init__(self, client: DroneClient, period: float = 0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.client = client
+        self.period = period
+        self.clock = clock
+        self.frame = None
+        self.errors = 0
+        self.running = threading.Event()
+        self.first_frame = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, timeout: float = 5):
+        """
+        start fetching frames, waiting up to the timeout for the first one
+        """
+        if self.thread is not None:
+            return
+        self.running.set()
+        self.thread = threading.Thread(target=self.run, name="sensor acquisition", daemon=True)
+        self.thread.start()
+        if not self.first_frame.wait(timeout):
+            logging.warning(f"no sensor frame was received within {timeout} seconds")
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        seq = 0
+        while self.running.is_set():
+            start = self.clock()
+            try:
+                pose = self.client.getPose()
+                point_cloud = self.client.getLidarData()
+            except Exception:
+                # a failed request shouldn't stop the acquisition, the planner notices the frames are stale
+                self.errors += 1
+                logging.exception("failed fetching a sensor frame")
+                time.sleep(max(self.period, 0.01))
+                continue
+
+            seq += 1
+            # replacing the reference is atomic, so the readers see either the old frame or the new one
+            self.frame = SensorFrame(seq, self.clock(), pose, point_cloud)
+            self.first_frame.set()
+
+            remaining = self.period - (self.clock() - start)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def latest(self) -> Optional[SensorFrame]:
+        """
+        returns the newest frame without waiting, or None if none was fetched yet
+        """
+        return self.frame
+
+    def age(self, frame: SensorFrame) -> float:
+        """
+        returns how long ago the frame was received, in seconds
+        """
+        return self.clock() - frame.timestamp
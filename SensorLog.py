@@ -0,0 +1,212 @@
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+import DroneTypes
+from Clock import Clock
+from DroneClient import DroneClient
+
+# each frame is a fixed size record in the index file,
+# pointing at the points of its cloud in the points file, where they are stored as consecutive x, y, z values
+FRAME_DTYPE = np.dtype([("time", "<f8"),
+                        ("x", "<f8"), ("y", "<f8"), ("z", "<f8"),
+                        ("roll", "<f8"), ("pitch", "<f8"), ("yaw", "<f8"),
+                        ("offset", "<i8"), ("count", "<i8")])
+POINT_DTYPE = np.dtype("<f4")
+
+
+class ReplayFinished(Exception):
+    """
+    raised when the planner asks for more frames than were recorded
+    """
+
+
+class ReplayClock(Clock):
+    """
+    the time of the frame being replayed, which only passes when the replay moves on to the next frame,
+    so the planner sees the same times as during the recording, no matter how fast the frames are replayed
+    """
+
+    def __init__(self, start: float = 0) -> None:
+        self.time = start
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep(self, duration: float):
+        # the frames are replayed as fast as they are requested
+        pass
+
+
+class RecordingDroneClient(DroneClient):
+    """
+    a drone client which passes everything through to another client,
+    while recording the pose and the LIDAR point cloud of each iteration into an append only log.
+
+    the log is made of two files: path.idx, with a fixed size record for each frame,
+    and path.pts with the points of all the frames one after the other.
+    each frame is stamped with the time its pose was read, from the given clock,
+    which should be the clock of the planner, so its replay sees the same times.
+    """
+
+    def __init__(self, client: DroneClient, path: str, clock: Callable[[], float] = time.monotonic) -> None:
+        # the airsim client of the wrapped client is used
+        self.future = None
+        self.client = client
+        self.path = path
+        self.clock = clock
+        self.index_file = open(path + ".idx", "ab")
+        self.points_file = open(path + ".pts", "ab")
+        self.offset = self.points_file.tell() // POINT_DTYPE.itemsize
+        self.pose: Optional[DroneTypes.Pose] = None
+        self.pose_time = 0.0
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if not self.index_file.closed:
+            self.index_file.close()
+            self.points_file.close()
+
+    def connect(self):
+        self.client.connect()
+
+    def isConnected(self):
+        return self.client.isConnected()
+
+    def getPose(self):
+        self.pose = self.client.getPose()
+        self.pose_time = self.clock()
+        return self.pose
+
+    def getLidarData(self):
+        point_cloud = self.client.getLidarData()
+        if self.pose is None:
+            self.getPose()
+        assert self.pose is not None
+
+        points = np.asarray(point_cloud.points, dtype=POINT_DTYPE)
+        frame = np.array([(self.pose_time,
+                           self.pose.pos.x_m, self.pose.pos.y_m, self.pose.pos.z_m,
+                           self.pose.orientation.x_rad, self.pose.orientation.y_rad, self.pose.orientation.z_rad,
+                           self.offset, len(points))], dtype=FRAME_DTYPE)
+
+        # the points are written before the record pointing at them,
+        # so an interrupted recording never has records pointing past the end of the points
+        self.points_file.write(points.tobytes())
+        self.points_file.flush()
+        self.index_file.write(frame.tobytes())
+        self.index_file.flush()
+        self.offset += len(points)
+        return point_cloud
+
+    def flyToPosition(self, x: float, y: float, z: float, v: float):
+        self.client.flyToPosition(x, y, z, v)
+
+    def flushCommands(self, force: bool = False):
+        self.client.flushCommands(force)
+
+    def flyWithVelocity(self, vx: float, vy: float, z: float, duration: float):
+        self.client.flyWithVelocity(vx, vy, z, duration)
+
+    def setAtPosition(self, x: float, y: float, z: float):
+        self.client.setAtPosition(x, y, z)
+
+    def reset(self):
+        self.client.reset()
+
+
+class ReplayDroneClient(DroneClient):
+    """
+    a drone client which serves the frames recorded by the recording client,
+    as fast as they are requested, instead of connecting to a drone.
+
+    each iteration is served the pose of the current frame,
+    and requesting its LIDAR data moves on to the next frame.
+    the commands sent to the drone are kept, but otherwise ignored.
+
+    the clock of the replay follows the times the frames were recorded at,
+    and should be given to the planner, so the obstacles are remembered and forgotten like they were during the recording.
+    """
+
+    clock: ReplayClock
+    """
+    the time of the frame that was served last
+    """
+
+    commands: List[Tuple[float, float, float, float]]
+    """
+    the position and velocity of each flight command sent to the drone
+    """
+
+    velocity_commands: List[Tuple[float, float, float, float]]
+    """
+    the velocity, height and duration of each velocity command sent to the drone
+    """
+
+    def __init__(self, path: str) -> None:
+        self.future = None
+        self.frames = np.memmap(path + ".idx", dtype=FRAME_DTYPE, mode="r")
+        self.points = np.memmap(path + ".pts", dtype=POINT_DTYPE, mode="r")
+        self.cursor = 0
+        self.commands = []
+        self.velocity_commands = []
+        self.clock = ReplayClock(float(self.frames[0]["time"]) if len(self.frames) > 0 else 0)
+
+    def __del__(self):
+        pass
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def connect(self):
+        pass
+
+    def isConnected(self):
+        return True
+
+    def frame(self) -> np.void:
+        if self.cursor >= len(self.frames):
+            raise ReplayFinished(f"all {len(self.frames)} recorded frames were replayed")
+        frame = self.frames[self.cursor]
+        self.clock.time = float(frame["time"])
+        return frame
+
+    def getPose(self):
+        frame = self.frame()
+        res = DroneTypes.Pose()
+        res.pos.x_m = float(frame["x"])
+        res.pos.y_m = float(frame["y"])
+        res.pos.z_m = float(frame["z"])
+        res.orientation.x_rad = float(frame["roll"])
+        res.orientation.y_rad = float(frame["pitch"])
+        res.orientation.z_rad = float(frame["yaw"])
+        return res
+
+    def getLidarData(self):
+        frame = self.frame()
+        self.cursor += 1
+        point_cloud = DroneTypes.PointCloud()
+        offset = int(frame["offset"])
+        point_cloud.points = self.points[offset:offset + int(frame["count"])]
+        return point_cloud
+
+    def flyToPosition(self, x: float, y: float, z: float, v: float):
+        self.commands.append((x, y, z, v))
+
+    def flushCommands(self, force: bool = False):
+        pass
+
+    def flyWithVelocity(self, vx: float, vy: float, z: float, duration: float):
+        self.velocity_commands.append((vx, vy, z, duration))
+
+    def setAtPosition(self, x: float, y: float, z: float):
+        pass
+
+    def reset(self):
+        self.cursor = 0
+        self.commands = []
+        self.velocity_commands = []
+        self.clock.time = float(self.frames[0]["time"]) if len(self.frames) > 0 else 0
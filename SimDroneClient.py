@@ -0,0 +1,357 @@
+import math
+import random
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+import numpy as np
+
+import DroneTypes
+from Clock import WALL_CLOCK, LockstepClock
+from DroneClient import CommandCoalescer, DroneClient
+from TangentBug import TangentBug
+from vec2 import Vec2
+
+
+class CityMap:
+    """
+    a city of box shaped buildings, placed in the blocks between the roads of a grid,
+    matching the grid of waypoints the tangent bug algorithm uses for finding taxicab paths.
+    """
+
+    boxes: np.ndarray
+    """
+    an (N, 5) array of the buildings, each with the x and y coordinates of its corners,
+    followed by its height in meters above the ground: min_x, min_y, max_x, max_y, height
+    """
+
+    def __init__(self, boxes: np.ndarray) -> None:
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+
+    @staticmethod
+    def generate(blocks_x: Tuple[int, int] = (-1, 7), blocks_y: Tuple[int, int] = (-4, 1),
+                 road_width: float = 30, min_height: float = 20, max_height: float = 120,
+                 known_waypoint: Vec2 = TangentBug.known_waypoint,
+                 grid_x_interval: float = TangentBug.grid_x_interval,
+                 grid_y_interval: float = TangentBug.grid_y_interval,
+                 seed: Optional[int] = None) -> "CityMap":
+        """
+        generate a random city, with a few buildings in each block between the roads,
+        where block (i, j) is to the positive side of the intersection i steps and j steps away from the known waypoint
+        """
+        rng = random.Random(seed)
+        boxes = []
+        for i in range(blocks_x[0], blocks_x[1]):
+            for j in range(blocks_y[0], blocks_y[1]):
+                # the part of the block that isn't road
+                left = known_waypoint.x + i * grid_x_interval + road_width / 2
+                right = left + grid_x_interval - road_width
+                bottom = known_waypoint.y + j * grid_y_interval + road_width / 2
+                top = bottom + grid_y_interval - road_width
+
+                # split the block into a grid of lots, leaving alleys between the buildings
+                columns = rng.randint(1, 3)
+                rows = rng.randint(1, 3)
+                lot_width = (right - left) / columns
+                lot_height = (top - bottom) / rows
+                for c in range(columns):
+                    for r in range(rows):
+                        if rng.random() < 0.15:
+                            # an empty lot
+                            continue
+                        margin_x = rng.uniform(2, lot_width / 4)
+                        margin_y = rng.uniform(2, lot_height / 4)
+                        boxes.append((left + c * lot_width + margin_x,
+                                      bottom + r * lot_height + margin_y,
+                                      left + (c + 1) * lot_width - margin_x,
+                                      bottom + (r + 1) * lot_height - margin_y,
+                                      rng.uniform(min_height, max_height)))
+        return CityMap(np.array(boxes))
+
+    def near(self, x: float, y: float, radius: float) -> np.ndarray:
+        """
+        returns the buildings that are closer than the radius to the given point on the ground
+        """
+        dx = np.maximum(np.maximum(self.boxes[:, 0] - x, x - self.boxes[:, 2]), 0)
+        dy = np.maximum(np.maximum(self.boxes[:, 1] - y, y - self.boxes[:, 3]), 0)
+        return self.boxes[np.hypot(dx, dy) <= radius]
+
+    def isOccupied(self, x: float, y: float, z: float, radius: float = 0) -> bool:
+        """
+        checks if the point is inside a building, or closer than the radius to one
+        """
+        return bool(np.any(self.near(x, y, radius)[:, 4] > -z))
+
+    def raycast(self, origin: np.ndarray, directions: np.ndarray, max_range: float) -> np.ndarray:
+        """
+        find the distance along each of the given unit directions, from the origin,
+        to the first building it hits, or infinity if it doesn't hit any within the range.
+        """
+        boxes = self.near(origin[0], origin[1], max_range)
+        if len(boxes) == 0:
+            return np.full(len(directions), math.inf)
+
+        # buildings span from the ground at z = 0 up to their height, z is negative above the ground
+        lower = np.stack((boxes[:, 0], boxes[:, 1], -boxes[:, 4]), axis=1)
+        upper = np.stack((boxes[:, 2], boxes[:, 3], np.zeros(len(boxes))), axis=1)
+
+        # the slab method, for every pair of ray and box at once
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverse = 1 / directions[:, None, :]
+            t1 = (lower[None, :, :] - origin) * inverse
+            t2 = (upper[None, :, :] - origin) * inverse
+        t1 = np.nan_to_num(t1, nan=-math.inf)
+        t2 = np.nan_to_num(t2, nan=math.inf)
+        near = np.minimum(t1, t2).max(axis=2)
+        far = np.maximum(t1, t2).min(axis=2)
+
+        hit = (near <= far) & (far > 0)
+        distances = np.where(hit, np.maximum(near, 0), math.inf)
+        distances = distances.min(axis=1)
+        distances[distances > max_range] = math.inf
+        return distances
+
+
+class SimDroneClient(DroneClient):
+    """
+    a drop in replacement for the drone client, which simulates the drone locally,
+    without airsim or a running simulator.
+
+    the drone is a simple kinematic model with limited acceleration, flying in a city of box shaped buildings,
+    and its LIDAR is a vectorized ray cast against them.
+    the simulation advances to the time given by its clock whenever it is accessed,
+    and is much faster than real time.
+    """
+
+    max_acceleration: float = 8
+    """
+    the maximum acceleration of the drone, in meters per second squared
+    """
+
+    yaw_rate: float = math.radians(180)
+    """
+    the maximum rate in radians per second at which the drone turns to face the direction it is flying in
+    """
+
+    drone_radius: float = 0.5
+    """
+    how close the center of the drone can get to a building, before it counts as a colision
+    """
+
+    vertical_gain: float = 1
+    """
+    how fast in meters per second the drone climbs or descends for each meter it is away from the height it should keep,
+    while flying at a commanded velocity
+    """
+
+    position_delay: float = 0.3
+    """
+    the time in seconds it takes the position controller to start flying to the target of a position command,
+    while velocity commands take effect right away
+    """
+
+    sim_step: float = 1 / 100
+    """
+    the longest interval, in seconds, the simulation advances by at once
+    """
+
+    lidar_range: float = 40
+    lidar_horizontal_resolution: int = 720
+    lidar_vertical_angles: Tuple[float, ...] = (-0.1, 0, 0.1)
+    """
+    the LIDAR casts rays up to its range, at each of the vertical angles, given in radians,
+    and at evenly spaced horizontal angles all around the drone
+    """
+
+    def __init__(self, city: Optional[CityMap] = None, clock: Callable[[], float] = WALL_CLOCK) -> None:
+        # the airsim client isn't created
+        self.future = None
+        self.city = city if city is not None else CityMap.generate(seed=0)
+        self.clock = clock
+        self.last_time = clock()
+        # the sensors might be fetched from another thread, while the drone is commanded
+        self.lock = threading.RLock()
+        self.coalescer = CommandCoalescer(clock)
+
+        self.position = np.zeros(3)
+        self.velocity = np.zeros(3)
+        self.yaw = 0.0
+        self.target: Optional[np.ndarray] = None
+        # the position commands which the position controller didn't start flying to yet,
+        # with the times they start at
+        self.delayed_targets: Deque[Tuple[float, np.ndarray, float]] = deque()
+        self.target_velocity = 0.0
+        # the velocity and height the drone was commanded to keep, and the time untill which to keep them
+        self.commanded_velocity: Optional[np.ndarray] = None
+        self.commanded_height = 0.0
+        self.commanded_until = 0.0
+
+        self.start_position = np.zeros(3)
+        self.colisions = 0
+        self.coliding = False
+        self.distance_travelled = 0.0
+        self.scans = 0
+
+        horizontal = np.linspace(-math.pi, math.pi,
+                                 self.lidar_horizontal_resolution, endpoint=False)
+        vertical = np.array(self.lidar_vertical_angles)
+        azimuth, elevation = np.meshgrid(horizontal, vertical)
+        # rays in the body frame, where z points down, so a positive elevation points up
+        self.lidar_rays = np.stack((np.cos(elevation) * np.cos(azimuth),
+                                    np.cos(elevation) * np.sin(azimuth),
+                                    -np.sin(elevation)), axis=-1).reshape(-1, 3)
+
+    def __del__(self):
+        pass
+
+    def connect(self):
+        self.last_time = self.clock()
+
+    def isConnected(self):
+        return True
+
+    def lockstep(self, clock: Optional[LockstepClock] = None) -> LockstepClock:
+        """
+        returns a clock which the simulation follows from now on,
+        advancing only as the clock is slept.
+        a clock can be given to be used instead of a new one, as long as it starts from zero
+        """
+        with self.lock:
+            self.advance()
+            # start the simulated time from zero, so every run counts time the same way
+            self.last_time = 0.0
+            self.clock = clock if clock is not None else LockstepClock()
+            self.coalescer.clock = self.clock
+            self.coalescer.reset()
+            return self.clock
+
+    def advance(self):
+        """
+        advance the simulation up to the current time of its clock
+        """
+        now = self.clock()
+        while self.last_time < now:
+            dt = min(self.sim_step, now - self.last_time)
+            self.step(dt)
+            self.last_time += dt
+
+    def step(self, dt: float):
+        """
+        advance the state of the drone by the given interval
+        """
+        while self.delayed_targets and self.delayed_targets[0][0] <= self.last_time:
+            _, self.target, self.target_velocity = self.delayed_targets.popleft()
+            self.commanded_velocity = None
+
+        desired = np.zeros(3)
+        if self.commanded_velocity is not None:
+            if self.last_time < self.commanded_until:
+                desired = self.commanded_velocity.copy()
+                desired[2] = self.vertical_gain * (self.commanded_height - self.position[2])
+        elif self.target is not None:
+            offset = self.target - self.position
+            distance = float(np.linalg.norm(offset))
+            if distance > 0.01:
+                # fly at the given velocity, slowing down in time to stop at the target
+                speed = min(self.target_velocity,
+                            math.sqrt(2 * self.max_acceleration * distance))
+                desired = offset / distance * speed
+
+        change = desired - self.velocity
+        max_change = self.max_acceleration * dt
+        change_size = float(np.linalg.norm(change))
+        if change_size > max_change:
+            change *= max_change / change_size
+        self.velocity = self.velocity + change
+
+        previous = self.position
+        self.position = self.position + self.velocity * dt
+
+        if self.city.isOccupied(self.position[0], self.position[1], self.position[2], self.drone_radius):
+            # the drone stops where it hit the building
+            if not self.coliding:
+                self.colisions += 1
+            self.coliding = True
+            self.position = previous
+            self.velocity = np.zeros(3)
+        else:
+            self.coliding = False
+            self.distance_travelled += float(np.linalg.norm(self.position - previous))
+
+        # the drone turns to face the direction it flies in
+        if math.hypot(self.velocity[0], self.velocity[1]) > 0.5:
+            heading = math.atan2(self.velocity[1], self.velocity[0])
+            turn = (heading - self.yaw + math.pi) % (2 * math.pi) - math.pi
+            max_turn = self.yaw_rate * dt
+            self.yaw += max(-max_turn, min(max_turn, turn))
+
+    def getPose(self):
+        with self.lock:
+            self.advance()
+            res = DroneTypes.Pose()
+            res.pos.x_m, res.pos.y_m, res.pos.z_m = self.position.tolist()
+            res.orientation.z_rad = self.yaw
+            return res
+
+    def getLidarData(self):
+        with self.lock:
+            self.advance()
+            self.scans += 1
+            position = self.position
+            yaw = self.yaw
+        point_cloud = DroneTypes.PointCloud()
+
+        cos = math.cos(yaw)
+        sin = math.sin(yaw)
+        rotation = np.array([[cos, -sin, 0], [sin, cos, 0], [0, 0, 1]])
+        directions = self.lidar_rays @ rotation.T
+
+        distances = self.city.raycast(position, directions, self.lidar_range)
+        hit = np.isfinite(distances)
+        # the points are given relative to the drone, in its body frame
+        points = self.lidar_rays[hit] * distances[hit, None]
+        point_cloud.points = points.reshape(-1).tolist()
+        return point_cloud
+
+    def sendFlyToPosition(self, x: float, y: float, z: float, v: float):
+        with self.lock:
+            self.advance()
+            self.delayed_targets.append((self.last_time + self.position_delay,
+                                         np.array([x, y, z], dtype=np.float64), v))
+
+    def flyWithVelocity(self, vx: float, vy: float, z: float, duration: float):
+        with self.lock:
+            self.advance()
+            self.coalescer.reset()
+            self.commanded_velocity = np.array([vx, vy, 0], dtype=np.float64)
+            self.commanded_height = z
+            self.commanded_until = self.last_time + duration
+            self.target = None
+            self.delayed_targets.clear()
+
+    def setAtPosition(self, x: float, y: float, z: float):
+        with self.lock:
+            self.advance()
+            self.position = np.array([x, y, z], dtype=np.float64)
+            self.start_position = self.position
+            self.velocity = np.zeros(3)
+            self.yaw = 0.0
+            self.coliding = False
+            # the drone is placed hovering at the position, without waiting for the position controller
+            self.target = self.position
+            self.target_velocity = 1
+            self.commanded_velocity = None
+            self.delayed_targets.clear()
+            self.coalescer.reset()
+
+    def reset(self):
+        with self.lock:
+            self.advance()
+            self.position = self.start_position
+            self.velocity = np.zeros(3)
+            self.yaw = 0.0
+            self.target = None
+            self.commanded_velocity = None
+            self.delayed_targets.clear()
+            self.coliding = False
+            self.coalescer.reset()
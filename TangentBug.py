@@ -1,13 +1,31 @@
+import contextlib
+import itertools
 import math
 import logging
 import time
-from typing import Generator, List, Optional, Set, Tuple, Dict, Iterable
+from typing import ContextManager, Generator, List, Optional, Set, Tuple, Dict, Iterable, TypeVar
 
+import numpy as np
+
+from Clock import WALL_CLOCK, Clock
 from DroneClient import *
 from DroneTypes import *
+from ObstacleMemory import ObstacleMemory
+from PersistentMap import PersistentMap
+from PolarScan import PolarScan
 from quat import Quaternion
+from RoadGraph import RoadGraph, Waypoint
+from SensorAcquisition import SensorAcquisition
+from TickCache import TickCache
+from TickProfiler import TickProfiler
+from TickScheduler import TickScheduler
 from vec2 import *
 
+V = TypeVar("V", Vec2, Vec2Array)
+
+# used in place of a stage timer when profiling is disabled
+NOT_PROFILED = contextlib.nullcontext()
+
 
 class TangentBug():
     colision_radius: float = 3
@@ -43,12 +61,31 @@ class TangentBug():
     to ensure the busy loop isn't doing redundant computation
     """
 
+    sensor_period: float = 1 / 50
+    """
+    the interval, in seconds, between reading the LIDAR and updating the obstacles,
+    which can be longer than the time step, to control the drone at a higher rate than the sensors are read.
+    the iterations in between only update the pose of the drone
+    """
+
     response_time: float = 0.7
     """
     The time a single movement command should take for it to be registered as a valid command.
     must be greater than 0.6, but not too much.
     """
 
+    velocity_control: bool = False
+    """
+    whether to command the velocity of the drone directly, instead of a position ahead of it,
+    so the drone responds to each command right away, rather than after the response time
+    """
+
+    velocity_command_duration: float = 0.25
+    """
+    how long in seconds the drone keeps each velocity command before stopping on its own,
+    long enough to outlast a few late iterations, and short enough to stop soon if the iterations stop
+    """
+
     memory_duration: float = 5
     """
     the time in seconds, that it takes for the drone to forget about a point,
@@ -61,6 +98,22 @@ class TangentBug():
     for it to count as having reached the goal
     """
 
+    blend_distance: float = 8
+    """
+    how far the current position of the drone can be from a waypoint it passes through without stopping,
+    for it to head to the next one
+    """
+
+    corner_velocity: float = 5
+    """
+    the maximum velocity the drone can have while passing through a waypoint where the path turns
+    """
+
+    straight_angle: float = math.pi / 6
+    """
+    the largest turn at a waypoint, in radians, through which the drone can keep its velocity
+    """
+
     sensor_range: float = 35
     """
     the maximum distance away from the drone, a point can be detected by its sensors,
@@ -109,31 +162,137 @@ class TangentBug():
     there is another intersection on the grid (within the borders of the map).
     """
 
+    batched_ingestion: bool = True
+    """
+    whether the LIDAR point cloud is converted to world frame in a single vectorized pass,
+    instead of going through detectObstacles point by point
+    """
+
+    ingestion_voxel_size: float = 0.5
+    """
+    the size in meters of the cells in the sensor frame, in which only the closest return is ingested,
+    so the many returns that end up in the same obstacle point are transformed once, or 0 to ingest every return
+    """
+
+    ingestion_far_range: float = 20
+    ingestion_far_voxel_size: float = 2
+    """
+    returns further than the far range are deduplicated in coarser cells,
+    since far obstacles only matter for where the drone can go, not for avoiding them
+    """
+
+    ingestion_point_budget: int = 0
+    """
+    the most returns ingested in a single iteration, the closest ones are kept, or 0 for no limit,
+    which bounds the work of each iteration for high resolution sensors
+    """
+
+    ingestion_z_band: float = 10
+    """
+    how far above or below the plane in meters returns can be to be ingested, or infinity to ingest them all,
+    since obstacles far from the plane can't be hit while flying along it
+    """
+
+    ingestion_ratio: float = 1
+    """
+    the number of returns in the point cloud for each return that was ingested, in the latest iteration
+    """
+
     client: DroneClient
     """
     the client with which the the algorithm communicates with the drone
     """
 
+    clock: Clock
+    """
+    the source of the time of the measurements, and of the waiting between iterations,
+    which is the real time, unless the simulation is run in lockstep with the algorithm
+    """
+
     plane: float
     """
     the z coordinate of the plane in which the algorithm is executed
     """
 
-    raw_obstacle_points: Dict[Vec2, int] = {}
-    obstacle_points: Dict[Vec2, int] = {}
+    raw_obstacle_points: Dict[Vec2, float]
+    obstacle_points: ObstacleMemory
     """
     the points detected by the drone on the way to the goal, in world frame,
-    with the number of iterations since that point was last spotted
+    with the time in seconds at which that point was last spotted,
+    indexed by their position on a grid, to quickly find the points near the drone
 
     (the raw points are the ones detected directly from the sensors,
     and the other ones, are modified according to the needs of the drone)
+
+    the obstacle points can be shared between drones flying at the same plane,
+    in which case each holds the lock of the memory while using it
+    """
+
+    obstacle_map: Optional[PersistentMap] = None
+    """
+    a long lived map of the obstacles in the plane, kept between missions, if available.
+    the detected points are recorded in it, and the obstacles it contains near the drone,
+    are merged into the obstacle points as if they were detected again.
     """
 
-    nearby_points: List[Vec2] = []
+    acquisition: Optional[SensorAcquisition] = None
+    """
+    fetches the pose and LIDAR data of the drone in the background, if set,
+    in which case the iterations use its newest frame instead of waiting for the client
+    """
+
+    max_frame_age: float = 0.1
+    """
+    how old in seconds the newest frame of the acquisition can be, before it counts as stale
+    """
+
+    frame_seq: int = 0
+    stale_frames: int = 0
+    dropped_frames: int = 0
+    """
+    the sequence number of the latest frame of the acquisition that was used,
+    the number of iterations which had no fresh frame to use,
+    and the number of frames which were replaced before any iteration could use them
+    """
+
+    profiler: Optional[TickProfiler] = None
+    """
+    measures the duration of each stage of the iterations of findPath, if set
+    """
+
+    memory_cell_size: float = 16
+    """
+    the size of the cells in the grid indexing the obstacle points,
+    small enough for the cells overlapping the sensor range to contain few points outside it
+    """
+
+    nearby_points: Vec2Array = Vec2Array.empty()
     """
     the obstacle points within the range of the drones sensor, in body frame
     """
 
+    nearby_keys: List[Vec2] = []
+    """
+    the nearby points as they are stored in the obstacle memory, in world frame
+    """
+
+    polar_bins: int = 360
+    """
+    the number of angular bins in the polar scan of the nearby points
+    """
+
+    polar_scan: Optional[PolarScan] = None
+    """
+    the nearby points binned by their angle around the drone, built once per iteration,
+    for answering the angular queries, and for inspecting what the drone sees while debugging
+    """
+
+    nearby_clusters: Optional[np.ndarray] = None
+    """
+    the labels of the obstacle clusters containing each nearby point,
+    found only once they are needed in each iteration
+    """
+
     position: Vec2 = Vec2(0, 0)
     """
     the current position of the drone in world frame, based on the latest measurements
@@ -150,25 +309,72 @@ class TangentBug():
     used only for initial conversions to the 2D plane
     """
 
+    height: float = 0
+    """
+    the current position of the drone on the z axis, based on the latest measurements
+    """
+
     goal: Vec2 = Vec2(0, 0)
     """
     the current goal which the drone is flying towards, in body frame
     """
 
+    update_time: float = 0
+    """
+    the time in seconds, of the latest measurements from the sensors
+    """
+
+    cache: TickCache
+    """
+    the results of the queries of the current iteration, which are forgotten whenever the pose or the nearby points change:
+    the rotation of the frames, the colisions of paths from the drone,
+    the followed boundaries around each followed point, and the heuristic distances of points
+    """
+
     cur_corridor_width: float = math.inf
     """
     the actual width of the corridor the drone is inside of
     """
 
-    vertigo: int = 0
+    vertigo_until: float = 0
     """
-    the number of ticks untill the vertigo from sharp turns subsides,
+    the time in seconds, untill the vertigo from sharp turns subsides,
     and the drone can move faster.
     """
 
-    def __init__(self, client: DroneClient, plane: float) -> None:
+    scheduler: Optional[TickScheduler] = None
+    """
+    the scheduler of the iterations of the latest path, which keeps the rate they actually ran at
+    """
+
+    through_velocity: float = 0
+    """
+    the velocity the drone can have when it reaches the current goal,
+    0 if it should stop there
+    """
+
+    road_graph: RoadGraph
+    """
+    the grid of roads between the waypoints, with the time it took to fly along each of them,
+    used for finding the fastest route between waypoints
+    """
+
+    def __init__(self, client: DroneClient, plane: float, obstacle_map: Optional[PersistentMap] = None,
+                 clock: Clock = WALL_CLOCK, obstacle_points: Optional[ObstacleMemory] = None) -> None:
         self.client = client
+        self.clock = clock
         self.plane = plane
+        self.obstacle_map = obstacle_map
+        self.raw_obstacle_points = {}
+        if obstacle_points is not None and obstacle_points.clusters is None:
+            # the blocking obstacle is found through the clusters of the points
+            raise ValueError("the shared obstacle memory must be created with a connection distance")
+        self.obstacle_points = obstacle_points if obstacle_points is not None \
+            else ObstacleMemory(self.memory_cell_size, self.connection_distance)
+        self.nearby_keys = []
+        self.cache = TickCache()
+        self.road_graph = RoadGraph(self.known_waypoint, self.grid_x_interval, self.grid_y_interval,
+                                    self.max_highway_velocity, self.max_highway_velocity, clock=clock)
 
     def stop(self):
         """
@@ -184,7 +390,7 @@ class TangentBug():
         length = point.length()
         if abs(Vec2(1, 0).angle(point)) > math.pi / 6:
             # flying through a sharp turn, expeciencing vertigo as a result
-            self.vertigo = round(2 / self.time_step)
+            self.vertigo_until = self.update_time + self.vertigo_duration
 
         velocity: float
         if length < 0.0001:
@@ -192,36 +398,52 @@ class TangentBug():
             velocity = self.stop_velocity
         else:
             # take atleast a second to respond to obstacles ahead
-            safety_velocity = min((p.length()
-                                   for p in self.nearby_points), default=math.inf)
-            if self.vertigo <= 0:
+            safety_velocity = self.nearby_points.length().min(initial=math.inf)
+            if self.update_time >= self.vertigo_until:
                 safety_velocity *= 1.5
-            else:
-                self.vertigo -= 1
 
-            # slow down next to goal, to avoid hitting obstacles near waypoints
-            velocity = min(limit, safety_velocity, self.goal.length() / 2)
+            # slow down next to goal, to avoid hitting obstacles near waypoints,
+            # unless passing through it to the next one
+            velocity = min(limit, safety_velocity, self.through_velocity + self.goal.length() / 2)
+
+        if self.velocity_control:
+            world_velocity = point.normalize().rotate(self.orientation) * velocity
+            with self.profile("flyToPosition"):
+                self.client.flyWithVelocity(
+                    world_velocity.x, world_velocity.y, self.plane, self.velocity_command_duration)
+            return
 
         # calculate the distance the drone should travel in the given direction,
         # so that it takes atleast as much time
         distance = velocity * self.response_time
         world_point = self.toWorldFrame(point.normalize() * distance)
-        self.client.flyToPosition(
-            world_point.x, world_point.y, self.plane, velocity)
+        with self.profile("flyToPosition"):
+            self.client.flyToPosition(
+                world_point.x, world_point.y, self.plane, velocity)
 
-    def toBodyFrame(self, point: Vec2) -> Vec2:
+    def toBodyFrame(self, point: V) -> V:
         """
-        given a point in world frame,
+        given a point in world frame, or an array of them,
         convert it to the equivalent point in the drones body frame
         """
-        return (point - self.position).rotate(-self.orientation)
+        cos, sin = self.getRotation()
+        return (point - self.position).rotateBy(cos, -sin)
 
-    def toWorldFrame(self, point: Vec2) -> Vec2:
+    def toWorldFrame(self, point: V) -> V:
         """
-        given a point in drones body frame,
+        given a point in drones body frame, or an array of them,
         convert it to the equivalent point in the world frame
         """
-        return point.rotate(self.orientation) + self.position
+        cos, sin = self.getRotation()
+        return point.rotateBy(cos, sin) + self.position
+
+    def getRotation(self) -> Tuple[float, float]:
+        """
+        returns the cosine and sine of the orientation of the drone,
+        computed once for each orientation, since every conversion between the frames needs them
+        """
+        return self.cache.get("rotation", self.orientation,
+                              lambda: (math.cos(self.orientation), math.sin(self.orientation)))
 
     def setGoal(self, goal: Vec2):
         """
@@ -230,29 +452,98 @@ class TangentBug():
         """
         self.goal = self.toBodyFrame(goal)
 
-    def detectObstacles(self) -> Generator[Vec2, None, None]:
+    def detectObstacles(self, point_cloud: List[float]) -> Generator[Vec2, None, None]:
         """
-        find points around the drone, detected by the drones LIDAR,
-        yielded in world frame
-        """
-        point_cloud = self.client.getLidarData().points
+        find points around the drone in the point cloud of the drones LIDAR,
+        yielded in world frame, after filtering the returns with filterPointCloud.
 
+        rotates each point on its own, as the reference for detectObstaclesBatch
+        """
         if len(point_cloud) < 3:
             # the cloud is empty, no points where observed
             return
 
-        for i in range(0, len(point_cloud), 3):
-            point = Quaternion(
-                point_cloud[i], point_cloud[i + 1], point_cloud[i + 2], 0)
+        points = np.asarray(point_cloud, dtype=np.float64)
+        points = points[:len(points) - len(points) % 3].reshape(-1, 3)
+        vertical = np.array(self.orientation3D.rotation_matrix()[2])
+        for x, y, z in self.filterPointCloud(points, vertical).tolist():
+            point = Quaternion(x, y, z, 0)
             rotated = self.orientation3D * point * self.orientation3D.conjugate()
             world_point = Vec2(rotated.x, rotated.y) + self.position
             yield world_point
 
+    def detectObstaclesBatch(self, point_cloud: List[float]) -> np.ndarray:
+        """
+        find points around the drone in the point cloud of the drones LIDAR,
+        returned as an (N, 2) integer array in world frame, already rounded like the obstacle points.
+
+        equivalent to rounding every point yielded by detectObstacles, which filters the returns the same way,
+        but rotates the entire cloud with a single rotation matrix.
+        """
+        if len(point_cloud) < 3:
+            # the cloud is empty, no points where observed
+            return np.empty((0, 2), dtype=np.int64)
+
+        points = np.asarray(point_cloud, dtype=np.float64)
+        points = points[:len(points) - len(points) % 3].reshape(-1, 3)
+
+        rotation = np.array(self.orientation3D.rotation_matrix())
+        points = self.filterPointCloud(points, rotation[2])
+
+        # only the rows producing the x and y coordinates are needed for the plane
+        world_points = points @ rotation[:2].T + (self.position.x, self.position.y)
+        return np.round(world_points).astype(np.int64)
+
+    def filterPointCloud(self, points: np.ndarray, vertical: np.ndarray) -> np.ndarray:
+        """
+        given an (N, 3) array of LIDAR returns in the sensor frame,
+        and the row of the rotation to world frame producing the z coordinate,
+        returns the returns that should be ingested:
+        those within the z band around the plane, and only the closest one in each cell,
+        up to the point budget, from the closest to the furthest.
+        """
+        total = len(points)
+        if total == 0:
+            return points
+
+        if math.isfinite(self.ingestion_z_band):
+            heights = points @ vertical + self.height
+            points = points[np.abs(heights - self.plane) <= self.ingestion_z_band]
+
+        ranges = np.linalg.norm(points, axis=1)
+        order = np.argsort(ranges, kind="stable")
+        points = points[order]
+        ranges = ranges[order]
+
+        if self.ingestion_voxel_size > 0:
+            far = ranges > self.ingestion_far_range
+            sizes = np.where(far, self.ingestion_far_voxel_size, self.ingestion_voxel_size)
+            cells = np.floor(points[:, :2] / sizes[:, None]).astype(np.int64)
+            # a single key for each cell, with the near and far cells apart,
+            # the cells are well within 2^20 of the drone for any sensor range
+            keys = ((cells[:, 0] << 21) + cells[:, 1]) * 2 + far
+            # the first return in each cell is the closest one, since they are ordered by range
+            _, first = np.unique(keys, return_index=True)
+            points = points[np.sort(first)]
+
+        if self.ingestion_point_budget > 0:
+            points = points[:self.ingestion_point_budget]
+
+        self.ingestion_ratio = total / max(len(points), 1)
+        return points
+
     def addObstaclePoint(self, point: Vec2):
         """
         add a point on an obstacle to the drones memory
         """
-        self.obstacle_points[point.round()] = 0
+        self.obstacle_points.refresh((point.round(),), self.update_time)
+
+    def addObstaclePoints(self, points: np.ndarray):
+        """
+        add an (N, 2) array of already rounded points on obstacles to the drones memory
+        """
+        xs, ys = points.T.tolist()
+        self.obstacle_points.refresh(map(Vec2, xs, ys), self.update_time)
 
     def forgetOldPoints(self):
         """
@@ -264,65 +555,171 @@ class TangentBug():
         and avoid iterating over the entire map just to find the nearby points
         """
 
-        forgotten = []
-        for point, iterations in self.obstacle_points.items():
-            if iterations > self.memory_duration / self.time_step:
-                forgotten.append(point)
-            else:
-                # the point stays for another iteration
-                self.obstacle_points[point] += 1
-                if point in self.raw_obstacle_points:
-                    self.raw_obstacle_points[point] += 1
-
+        # only the points spotted at expired times are visited,
+        # instead of aging every remembered point on each iteration
+        forgotten = self.obstacle_points.forget(
+            self.update_time - self.memory_duration)
         for p in forgotten:
-            self.obstacle_points.pop(p, None)
             self.raw_obstacle_points.pop(p, None)
 
-    def updateEnvironment(self):
+    def setPose(self, pose: Pose, update_time: float):
         """
-        update the state of the drone and surrounding obstacles,
-        based on the latest data from the sensors
+        update the position and orientation of the drone, and the goal relative to it,
+        from a pose measured at the given time
         """
-        pose = self.client.getPose()
+        self.update_time = update_time
         self.orientation3D = Quaternion.from_euler_angles(pose.orientation.x_rad,
                                                           pose.orientation.y_rad,
                                                           pose.orientation.z_rad)
         position = Vec2(pose.pos.x_m, pose.pos.y_m)
+        self.height = pose.pos.z_m
 
         world_goal = self.toWorldFrame(self.goal)
         self.position = position
         self.orientation = pose.orientation.z_rad
         self.goal = self.toBodyFrame(world_goal)
+
+    def readSensors(self, lidar: bool = True) -> Optional[List[float]]:
+        """
+        update the pose of the drone from the latest measurements,
+        returns the latest LIDAR point cloud if requested,
+        or None if there is no point cloud that wasn't already used
+        """
+        if self.acquisition is None:
+            with self.profile("getPose"):
+                pose = self.client.getPose()
+            self.setPose(pose, self.clock.now())
+            if not lidar:
+                return None
+            with self.profile("getLidarData"):
+                return self.client.getLidarData().points
+
+        frame = self.acquisition.latest()
+        if frame is None:
+            # nothing was fetched yet, the drone is where it was assumed to be
+            return None
+        self.setPose(frame.pose, frame.timestamp)
+        if not lidar:
+            return None
+
+        if frame.seq == self.frame_seq:
+            self.stale_frames += 1
+            return None
+        if self.acquisition.age(frame) > self.max_frame_age:
+            # still newer than anything that was used, so it is used anyway
+            self.stale_frames += 1
+        self.dropped_frames += frame.seq - self.frame_seq - 1
+        self.frame_seq = frame.seq
+        return frame.point_cloud.points
+
+    def updatePose(self):
+        """
+        update the state of the drone, without reading the LIDAR,
+        keeping the obstacles that were already detected in place
+        """
+        self.readSensors(lidar=False)
+        self.moveNearbyPoints()
+
+    def moveNearbyPoints(self):
+        """
+        update the nearby points to the current body frame, without searching for new ones
+        """
+        self.nearby_points = self.toBodyFrame(
+            Vec2Array.from_points(self.nearby_keys))
+        self.polar_scan = PolarScan(self.nearby_points, self.polar_bins)
+        self.cache.clear()
+
+    def updateEnvironment(self):
+        """
+        update the state of the drone and surrounding obstacles,
+        based on the latest data from the sensors
+        """
+        point_cloud = self.readSensors()
         self.cur_corridor_width = self.findCorridorWidth()
+        if point_cloud is None:
+            self.moveNearbyPoints()
+            return
+
+        with self.profile("detectObstacles"):
+            if self.batched_ingestion:
+                detected = self.detectObstaclesBatch(point_cloud)
+            else:
+                rounded = [p.round() for p in self.detectObstacles(point_cloud)]
+                detected = np.array([(p.x, p.y) for p in rounded],
+                                    dtype=np.int64).reshape(-1, 2)
+
+        # the memory and the map might be shared with other drones
+        with self.obstacle_points.lock:
+            with self.profile("addObstaclePoints"):
+                if self.batched_ingestion:
+                    self.addObstaclePoints(detected)
+                else:
+                    for point in rounded:
+                        self.addObstaclePoint(point)
+
+                if self.obstacle_map is not None:
+                    self.obstacle_map.mark(detected)
+                    # remember obstacles seen on previous missions, which aren't necessarily visible yet
+                    self.addObstaclePoints(self.obstacle_map.query(
+                        self.position, self.sensor_range))
 
-        for point in self.detectObstacles():
-            self.addObstaclePoint(point)
+            with self.profile("forgetOldPoints"):
+                self.forgetOldPoints()
 
-        self.forgetOldPoints()
+            with self.profile("queryObstaclePoints"):
+                keys = self.obstacle_points.query(self.position, self.sensor_range)
 
         # ignore points that are too close to the drone,
         # which might make it seem like the drone is inside the wall
-        self.nearby_points = [self.toBodyFrame(p) for p in self.obstacle_points.keys()
-                              if 1 < p.distance(self.position) < self.sensor_range]
+        with self.profile("nearby_points"):
+            nearby = self.toBodyFrame(Vec2Array.from_points(keys))
+            not_too_close = nearby.length() > 1
+            self.nearby_points = nearby[not_too_close]
+            self.nearby_keys = list(itertools.compress(keys, not_too_close.tolist()))
+            self.polar_scan = PolarScan(self.nearby_points, self.polar_bins)
+            self.nearby_clusters = None
+            self.cache.clear()
+
+    def profile(self, stage: str) -> ContextManager:
+        """
+        returns a context manager measuring the duration of the given stage,
+        which does nothing if profiling is disabled
+        """
+        if self.profiler is None:
+            return NOT_PROFILED
+        return self.profiler.stage(stage)
 
     def checkObstaclesInPath(self) -> bool:
         """
         checks if there is an obstacle in the path between the drone and the goal
         """
-        return any(checkoverlapCircle(Vec2(0, 0), self.goal, p, self.colision_radius) for p in self.nearby_points)
+        return self.findPathColisions(self.goal)[1] is not None
 
-    def checkPointsConnected(self, p1: Vec2, p2: Vec2) -> bool:
+    def findPathColisions(self, path: Vec2) -> Tuple[np.ndarray, Optional[Vec2]]:
         """
-        returns whether the colision circles of the two given points intersect,
-        indicating that they are conneced.
+        returns a mask of the nearby points which intersect with the given path from the origin,
+        and the closest point on an obstacle intersecting with it, if there is one.
+
+        each path is checked once per iteration,
+        since the path to the goal is checked by several of the queries
         """
-        return p1.distance(p2) <= self.connection_distance
+        return self.cache.get("path_colisions", path, lambda: self.checkPathColisions(path))
 
-    def findPath(self, goal: Vec2, limit: float = max_ubran_velocity):
+    def checkPathColisions(self, path: Vec2) -> Tuple[np.ndarray, Optional[Vec2]]:
+        on_path, closest = checkoverlapCircles(
+            Vec2(0, 0), path, self.nearby_points, self.colision_radius)
+        return on_path, None if closest is None else self.nearby_points[closest]
+
+    def findPath(self, goal: Vec2, limit: float = max_ubran_velocity, through_velocity: float = 0):
         """
         flies the drone towards the goal,
-        avoiding obstacles as necessary using the tangent bug algorithm
+        avoiding obstacles as necessary using the tangent bug algorithm.
+
+        if a through velocity is given, the drone passes through the goal at up to that velocity,
+        and returns once it is close to it, instead of stopping there
         """
+        self.through_velocity = through_velocity
+        arrival_distance = self.goal_epsilon if through_velocity <= 0 else self.blend_distance
         self.setGoal(goal)
         self.updateEnvironment()
 
@@ -334,19 +731,41 @@ class TangentBug():
         # while it could still make progress, in world frame
         last_direction = self.goal.rotate(-self.orientation).normalize()
 
+        # the iterations are spaced by deadlines, rather than sleeping after the work of each one,
+        # so the time the work takes doesn't slow down the rate
+        self.scheduler = TickScheduler(self.time_step, self.sensor_period,
+                                       clock=self.clock.now, sleep=self.clock.sleep)
+
         while True:
-            self.updateEnvironment()
+            if self.profiler is not None:
+                self.profiler.beginTick()
 
-            if self.goal.length() <= self.goal_epsilon:
+            if self.scheduler.sensorDue():
+                self.updateEnvironment()
+            else:
+                self.updatePose()
+
+            if self.goal.length() <= arrival_distance:
                 # arrived at the destination
-                self.stop()
+                if through_velocity <= 0:
+                    self.stop()
+                # a command held back for coming too soon is the latest target, which no later command replaces
+                self.client.flushCommands(force=True)
+                if self.profiler is not None:
+                    self.profiler.endTick(self.time_step)
+                logging.debug(f"arrived after {self.scheduler.ticks} ticks, "
+                              f"at {self.scheduler.achievedRate():.1f} ticks per second, "
+                              f"skipping {self.scheduler.skipped}")
+                logging.debug("cache hit rates: " + " ".join(
+                    f"{name}={rate:.0%}" for name, rate in self.cache.hitRates().items()))
                 return
 
             if following_boundary:
                 # if the drone ended up following a boundary,
                 # it might be off the road, dont speed up
                 limit = self.max_ubran_velocity
-                point = next(boundary_following_planner, None)
+                with self.profile("followBoundary"):
+                    point = next(boundary_following_planner, None)
                 if point is None:
                     # motion to goal can make progress now,
                     # reset motion to goal and start it
@@ -356,7 +775,8 @@ class TangentBug():
                     self.autoFlyTo(point, limit=limit)
 
             else:
-                point = next(motion_to_goal_planner, None)
+                with self.profile("motionToGoal"):
+                    point = next(motion_to_goal_planner, None)
                 if point is None:
                     # motion to goal cant make progress,
                     # reset following the boundary and start it
@@ -368,7 +788,13 @@ class TangentBug():
                     last_direction = point.rotate(
                         -self.orientation).normalize()
 
-            time.sleep(self.time_step)
+            # ticks that didn't send a command still send one that was held back, once it may be sent
+            self.client.flushCommands()
+
+            if self.profiler is not None:
+                self.profiler.endTick(self.time_step)
+
+            self.scheduler.wait()
 
     def findTaxicabPath(self, goal: Vec2):
         """
@@ -376,36 +802,85 @@ class TangentBug():
         called waypoints, which allows for faster and safer movement,
         since the roads between each waypoint are known to be clear of obstacles.
 
-        approximates the simplest path between the start and the goal, with the shortest taxicab distance.
+        the route between the waypoints is the fastest one, based on how long the roads took to fly along before,
+        avoiding roads that turned out to be blocked.
         """
         position = self.client.getPose().pos
-        pos = Vec2(position.x_m, position.y_m)
+        for point, limit, road in self.taxicabLegs(Vec2(position.x_m, position.y_m), goal):
+            self.flyLeg(point, limit, road)
+
+    def flyMission(self, goals: List[Vec2]):
+        """
+        find a taxicab path through each of the goals in turn,
+        passing through the waypoints and the goals on the way without stopping, and only stopping at the last goal.
 
+        the legs to the next goal are planned before arriving at the current one,
+        so the drone knows where it heads after each waypoint while approaching it
+        """
+        if not goals:
+            return
+        position = self.client.getPose().pos
+        previous = Vec2(position.x_m, position.y_m)
+        legs = self.taxicabLegs(previous, goals[0])
+        for i in range(len(goals)):
+            next_legs = self.taxicabLegs(goals[i], goals[i + 1]) if i + 1 < len(goals) else []
+            following = legs[1:] + next_legs[:1]
+            for (point, limit, road), after in itertools.zip_longest(legs, following):
+                through_velocity = 0 if after is None else self.findThroughVelocity(previous, point, after[0],
+                                                                                     min(limit, after[1]))
+                self.flyLeg(point, limit, road, through_velocity)
+                previous = point
+            legs = next_legs
+
+    def taxicabLegs(self, start: Vec2, goal: Vec2) -> List[Tuple[Vec2, float, Optional[List[Waypoint]]]]:
+        """
+        returns the points the drone flies to in turn, to follow a taxicab path from the start to the goal,
+        with the velocity limit towards each, and the straight part of the route it flies along, if it is on the roads
+        """
         # find the path through waypoints first
         # then do the rest with normal tangent bug
-        rel_pos = pos - self.known_waypoint
-        rel_goal = goal - self.known_waypoint
-        start_waypoint = Vec2(round(rel_pos.x / self.grid_x_interval) * self.grid_x_interval,
-                              round(rel_pos.y / self.grid_y_interval) * self.grid_y_interval) + self.known_waypoint
-        end_waypoint = Vec2(round(rel_goal.x / self.grid_x_interval) * self.grid_x_interval,
-                            round(rel_goal.y / self.grid_y_interval) * self.grid_y_interval) + self.known_waypoint
-
-        # seperate the path between the waypoints to a horizontal and vertical part,
-        # to match the roads between them. in those roads the drone can be faster.
-        self.findPath(start_waypoint, limit=self.max_ubran_velocity)
-        self.findPath(Vec2(end_waypoint.x, start_waypoint.y),
-                      limit=self.max_highway_velocity)
-        self.findPath(end_waypoint, limit=self.max_highway_velocity)
-        self.findPath(goal, limit=self.max_ubran_velocity)
+        start_waypoint = self.road_graph.nearest(start)
+        end_waypoint = self.road_graph.nearest(goal)
+        route = self.road_graph.route(start_waypoint, end_waypoint)
+
+        legs: List[Tuple[Vec2, float, Optional[List[Waypoint]]]] = [
+            (self.road_graph.position(start_waypoint), self.max_ubran_velocity, None)]
+        if route is not None and len(route) > 1:
+            # fly along each straight part of the route at once, to match the roads between them.
+            # in those roads the drone can be faster.
+            legs += [(self.road_graph.position(leg[-1]), self.max_highway_velocity, leg)
+                     for leg in self.road_graph.legs(route)]
+        legs.append((goal, self.max_ubran_velocity, None))
+        return legs
+
+    def flyLeg(self, point: Vec2, limit: float, road: Optional[List[Waypoint]], through_velocity: float = 0):
+        """
+        fly to the point, learning how long the road took, if it is flown along one
+        """
+        started = self.clock.now()
+        self.findPath(point, limit=limit, through_velocity=through_velocity)
+        if road is not None:
+            self.road_graph.record(road, self.clock.now() - started)
+
+    def findThroughVelocity(self, previous: Vec2, point: Vec2, following: Vec2, limit: float) -> float:
+        """
+        returns the velocity the drone can pass through the point at, coming from the previous point,
+        and heading to the following one, slowing down for turns
+        """
+        incoming = point - previous
+        outgoing = following - point
+        if incoming.length() < 0.0001 or outgoing.length() < 0.0001:
+            return self.corner_velocity
+        if abs(incoming.angle(outgoing)) <= self.straight_angle:
+            return limit
+        return self.corner_velocity
 
     def findSegmentColision(self, path: Vec2) -> Optional[Vec2]:
         """
         returns the first point on an obstacle which intersects with the given path from the origin,
         if the segment intersects with an obstacle
         """
-        return min((p for p in self.nearby_points if checkoverlapCircle(
-                    Vec2(0, 0), path, p, self.colision_radius)),
-                   key=lambda p: p.length(), default=None)
+        return self.findPathColisions(path)[1]
 
     def motionToGoal(self) -> Generator[Vec2, None, None]:
         """
@@ -435,39 +910,34 @@ class TangentBug():
             else:
                 yield self.goal
 
-    def getBlockingObstacle(self, path: Vec2) -> List[Vec2]:
+    def getNearbyClusters(self) -> np.ndarray:
+        """
+        returns the labels of the obstacle clusters containing each of the nearby points,
+        points with the same label are connected by their colision circles
+        """
+        if self.nearby_clusters is None:
+            clusters = self.obstacle_points.clusters
+            assert clusters is not None
+            with self.obstacle_points.lock:
+                self.nearby_clusters = clusters.labelPoints(self.nearby_keys)
+        return self.nearby_clusters
+
+    def getBlockingObstacle(self, path: Vec2) -> Vec2Array:
         """
         finds all of the points on the obstacle blocking the path
         """
+        return self.nearby_points[self.getBlockingMask(path)]
 
-        # the points of the blocking obstacle, connected by their colision circles
-        obstacle = []
-
-        counter_clockwise_points = []
-        clockwise_points = []
-
-        self.nearby_points.sort(key=lambda p: path.angle(p))
-
-        # since a point clockwise to the goal can be connected to a point counter clockwise,
-        # all points directly on the path have to be found before deciding whether the rest are connected
-        for point in self.nearby_points:
-            if checkoverlapCircle(Vec2(0, 0), path, point, self.colision_radius):
-                obstacle.append(point)
-            elif path.angle(point) > 0:
-                counter_clockwise_points.append(point)
-            else:
-                clockwise_points.append(point)
-
-        # find points connected to the obstacle from either end, while maintaining the order,
-        # so that the first and last points in the obstacle are the discontinuity points
-        for point in counter_clockwise_points:
-            if any(self.checkPointsConnected(point, p) for p in obstacle):
-                obstacle.append(point)
+    def getBlockingMask(self, path: Vec2) -> np.ndarray:
+        """
+        returns a mask of the nearby points which are on the obstacle blocking the path
+        """
+        on_path = self.findPathColisions(path)[0]
 
-        for point in reversed(clockwise_points):
-            if any(self.checkPointsConnected(point, p) for p in obstacle):
-                obstacle.append(point)
-        return obstacle
+        # the obstacle is made of the clusters of the points directly on the path,
+        # which are kept up to date by the obstacle memory as points are added and forgotten
+        clusters = self.getNearbyClusters()
+        return np.isin(clusters, clusters[on_path])
 
     def findDiscontinuityPoints(self) -> Optional[Tuple[Vec2, Vec2]]:
         """
@@ -477,19 +947,23 @@ class TangentBug():
         returns None.
         """
 
-        obstacle = self.getBlockingObstacle(self.goal)
+        obstacle = self.getBlockingMask(self.goal)
 
         # rotate points away from the obstacle,
         # such that the new point is on the tangent to the colision circle,
         # to avoid coliding on the obstacle,
         # when no furthur discontinuity points can be found
-        cw = min(obstacle, key=lambda p: self.goal.angle(p))
+        assert self.polar_scan is not None
+        cw_index, ccw_index = self.polar_scan.extremeAngles(
+            obstacle, math.atan2(self.goal.y, self.goal.x))
+
+        cw = self.nearby_points[cw_index]
         cw_avoidance_angle = getFoVCoverage(cw, self.boundary_distance)
         if cw_avoidance_angle is None:
             return None
         cw = cw.rotate(-cw_avoidance_angle)
 
-        ccw = max(obstacle, key=lambda p: self.goal.angle(p))
+        ccw = self.nearby_points[ccw_index]
         ccw_avoidance_angle = getFoVCoverage(ccw, self.boundary_distance)
         if ccw_avoidance_angle is None:
             return None
@@ -498,21 +972,27 @@ class TangentBug():
         return cw, ccw
 
     def heuristicDistance(self, point: Vec2) -> float:
-        return point.length() + point.distance(self.goal)
+        return self.cache.get("heuristic_distance", (point, self.goal),
+                              lambda: point.length() + point.distance(self.goal))
 
-    def getFollowedBoundary(self, followed_point: Vec2) -> Generator[Vec2, None, None]:
+    def getFollowedBoundary(self, followed_point: Vec2) -> Vec2Array:
         """
         returns the points on the boundary near the currently followed point,
         that should be considered as the part of the obstacle being followed.
         """
+        return self.cache.get("followed_boundary", followed_point,
+                              lambda: self.nearby_points[self.nearby_points.distance(followed_point)
+                                                         < self.getFollowedRadius()])
+
+    def getFollowedRadius(self) -> float:
+        """
+        returns how far points can be from the followed point to be part of the followed boundary
+        """
         corridor_ratio = self.cur_corridor_width / self.corridor_distance
         # ensure that the resized circle around the followed point,
         # does not include the other side of the corridor
         resize = min(1, 0.9 * corridor_ratio)
-
-        for point in self.nearby_points:
-            if point.distance(followed_point) < resize * self.corridor_distance:
-                yield point
+        return resize * self.corridor_distance
 
     def followBoundary(self, prev_path_hint: Optional[Vec2] = None) -> Generator[Vec2, None, None]:
         """
@@ -532,20 +1012,19 @@ class TangentBug():
         #
         # include initial blocking obstacle in followed distance calculations,
         # to avoid going back and forth between boundary following and motion-to-goal.
-        prev_followed_obstacle = [self.toWorldFrame(p)
-                                  for p in self.getBlockingObstacle(self.goal)]
+        prev_followed_obstacle = self.toWorldFrame(
+            self.getBlockingObstacle(self.goal))
 
         while True:
 
             # ensure that the obstacle contains only points that are currently nearby
-            followed_obstacle = set(self.toBodyFrame(p).round()
-                                    for p in prev_followed_obstacle)
-            followed_obstacle.intersection_update(p.round()
-                                                  for p in self.nearby_points)
+            followed_obstacle = set(self.toBodyFrame(
+                prev_followed_obstacle).round())
+            followed_obstacle.intersection_update(self.nearby_points.round())
 
             # ensure that obstacles in the way to the followed obstalce are not ignored,
-            followed_obstacle.update(
-                p for p in self.nearby_points if p.length() < self.boundary_distance * 1.5)
+            followed_obstacle.update(self.nearby_points[
+                self.nearby_points.length() < self.boundary_distance * 1.5])
 
             followed_point = min(followed_obstacle,
                                  key=lambda p: p.length(), default=None)
@@ -561,8 +1040,8 @@ class TangentBug():
             followed_obstacle.update(
                 self.getFollowedBoundary(followed_point))
 
-            prev_followed_obstacle = [
-                self.toWorldFrame(p) for p in followed_obstacle]
+            prev_followed_obstacle = self.toWorldFrame(
+                Vec2Array.from_points(followed_obstacle))
 
             if right_follow is None:
                 # helps convince pyright linter that followed point is not None in this branch
@@ -588,8 +1067,8 @@ class TangentBug():
             # is at the edge of free space
             blocking_point = self.findSegmentColision(self.goal)
             reachable_distance = max(self.goal.length() - self.sensor_range, 0)\
-                if blocking_point is None else min(p.distance(self.goal)
-                                                   for p in self.getFollowedBoundary(blocking_point))
+                if blocking_point is None else \
+                self.getFollowedBoundary(blocking_point).distance(self.goal).min(initial=math.inf)
 
             if min_followed_distance > reachable_distance:
                 # end boundary following behavior, now that the goal is in reach
@@ -605,15 +1084,23 @@ class TangentBug():
         finds the width of the corridor the drone is in,
         if the drone is not in a corridor, that distance is infinity.
         """
-        closest_point = min(
-            self.nearby_points, key=lambda p: p.length(), default=None)
+        if self.polar_scan is not None:
+            closest = self.polar_scan.closestPoint()
+            if closest is None:
+                return math.inf
+            return self.polar_scan.ranges[closest] + self.polar_scan.closestOpposing(closest)
 
-        if closest_point is None:
+        # before the first scan, the width is found by going over every nearby point
+        lengths = self.nearby_points.length()
+        closest = self.nearby_points.argmin(lengths)
+
+        if closest is None:
             return math.inf
 
-        opposing_distance = min((p.length() for p in self.nearby_points
-                                if abs(closest_point.angle(p)) > math.pi / 2), default=math.inf)
-        return closest_point.length() + opposing_distance
+        closest_point = self.nearby_points[closest]
+        opposing = np.abs(self.nearby_points.angle_from(closest_point)) > math.pi / 2
+        opposing_distance = lengths[opposing].min(initial=math.inf)
+        return lengths[closest] + opposing_distance
 
     def getNextFollowPoint(self, followed_point: Vec2, right_follow: bool) -> Vec2:
         """
@@ -624,25 +1111,21 @@ class TangentBug():
 
         angle_sign = 1 if right_follow else -1
 
-        away_point = Vec2(0, 0)
-        max_angle = -math.inf
-
-        for point in self.getFollowedBoundary(followed_point):
-            # ensure that the distance from the boundary is small enough,
-            # to avoid being closer to the other side of the corridor
-            resize = min(1, 0.4 * self.cur_corridor_width)
-            radius = min(resize * self.boundary_distance,
-                         0.9999 * point.length())
+        boundary = self.getFollowedBoundary(followed_point)
+        if len(boundary) == 0:
+            return Vec2(0, 0)
 
-            # rotate away from the obstacle to avoid coliding with it
-            avoidance_angle = getFoVCoverage(point, radius)
-            assert avoidance_angle is not None
-            rotated = point.rotate(avoidance_angle * angle_sign)
+        # ensure that the distance from the boundary is small enough,
+        # to avoid being closer to the other side of the corridor
+        lengths = boundary.length()
+        resize = min(1, 0.4 * self.cur_corridor_width)
+        radius = np.minimum(resize * self.boundary_distance, 0.9999 * lengths)
 
-            # find the point that would avoid all other points on the obstacle as well
-            angle = angle_sign * followed_point.angle(rotated)
-            if max_angle < angle:
-                max_angle = angle
-                away_point = rotated
+        # rotate away from the obstacle to avoid coliding with it,
+        # by the same angle as getFoVCoverage, which is defined since the radius is smaller than the length
+        avoidance_angles = np.arctan2(radius, np.sqrt(lengths**2 - radius**2))
+        rotated = boundary.rotate(avoidance_angles * angle_sign)
 
-        return away_point
+        # find the point that would avoid all other points on the obstacle as well
+        angles = angle_sign * rotated.angle_from(followed_point)
+        return rotated[int(np.argmax(angles))]
@@ -0,0 +1,60 @@
+from typing import Any, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class TickCache:
+    """
+    the results of queries that depend only on the state of the current iteration,
+    so each is computed once, no matter how many of the planners ask for it.
+
+    the results are kept in separate tables by the name of the query,
+    and are all forgotten together once the state changes.
+    the hits and misses of each query are counted over every iteration, for its hit rate.
+    """
+
+    tables: Dict[str, Dict[Hashable, Any]]
+    """
+    the cached results of each query, by the arguments they were computed for
+    """
+
+    hits: Dict[str, int]
+    misses: Dict[str, int]
+    """
+    the number of times each query was answered from the cache, and the number of times it was computed
+    """
+
+    def __init__(self) -> None:
+        self.tables = {}
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, name: str, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        returns the result of the query for the given key,
+        computing it only if it wasn't already computed during the current iteration
+        """
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = {}
+        elif key in table:
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return table[key]
+
+        self.misses[name] = self.misses.get(name, 0) + 1
+        result = table[key] = compute()
+        return result
+
+    def clear(self):
+        """
+        forget every result, since the state the iteration depends on changed
+        """
+        for table in self.tables.values():
+            table.clear()
+
+    def hitRates(self) -> Dict[str, float]:
+        """
+        returns the fraction of the lookups of each query that were answered from the cache
+        """
+        return {name: self.hits.get(name, 0) / (self.hits.get(name, 0) + misses)
+                for name, misses in self.misses.items()}
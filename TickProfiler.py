@@ -0,0 +1,154 @@
+import logging
+import time
+import tracemalloc
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class StageTimer:
+    """
+    measures the durations of a single stage of the iterations,
+    keeping only the latest ones, for rolling statistics.
+
+    used as a context manager around the stage, and reused for every measurement of it.
+    """
+
+    durations: Deque[float]
+    """
+    the latest durations of the stage, in seconds
+    """
+
+    def __init__(self, window: int) -> None:
+        self.durations = deque(maxlen=window)
+        self.start = 0.0
+        self.count = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.record(time.perf_counter() - self.start)
+
+    def record(self, duration: float):
+        self.durations.append(duration)
+        self.count += 1
+
+    def percentile(self, fraction: float) -> float:
+        if not self.durations:
+            return 0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def statistics(self) -> Dict[str, float]:
+        return {"p50": self.percentile(0.5),
+                "p99": self.percentile(0.99),
+                "max": max(self.durations, default=0),
+                "count": self.count}
+
+
+class TickProfiler:
+    """
+    measures how long each stage of the iterations of the algorithm takes,
+    and how many iterations took longer than the interval between them.
+
+    the statistics are available through summary(),
+    and are also logged periodically in a single line.
+    """
+
+    window: int
+    """
+    the number of latest measurements of each stage the statistics are calculated over
+    """
+
+    summary_interval: Optional[float]
+    """
+    the interval in seconds between logging the summary of the statistics, or None to never log it
+    """
+
+    track_allocations: bool
+    """
+    whether to measure the memory allocated in each iteration with tracemalloc, which slows down every allocation:
+    the peak memory in bytes allocated during the iteration beyond what was allocated when it started,
+    which includes temporary objects freed before it ended, as long as they were alive at the same time,
+    and the memory in bytes it left allocated, which is net of everything freed during it
+    """
+
+    stages: Dict[str, StageTimer]
+    """
+    the timers of the stages, by their names, including the entire iteration as "tick"
+    """
+
+    def __init__(self, window: int = 500, summary_interval: Optional[float] = 5,
+                 track_allocations: bool = False) -> None:
+        self.window = window
+        self.summary_interval = summary_interval
+        self.track_allocations = track_allocations
+        self.stages = {}
+        self.ticks = 0
+        self.overruns = 0
+        self.allocations: Deque[int] = deque(maxlen=window)
+        self.retained: Deque[int] = deque(maxlen=window)
+        self.tick_timer = self.stage("tick")
+        self.allocated_bytes = 0
+        self.last_summary = time.monotonic()
+
+    def stage(self, name: str) -> StageTimer:
+        """
+        returns the timer of the stage with the given name, to be used as a context manager around it
+        """
+        timer = self.stages.get(name)
+        if timer is None:
+            timer = StageTimer(self.window)
+            self.stages[name] = timer
+        return timer
+
+    def beginTick(self):
+        self.tick_timer.__enter__()
+        if self.track_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.allocated_bytes = tracemalloc.get_traced_memory()[0]
+
+    def endTick(self, budget: float):
+        """
+        end the measurement of the current iteration,
+        which counts as an overrun if it took longer than the given budget in seconds
+        """
+        self.tick_timer.__exit__()
+        if self.track_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocations.append(peak - self.allocated_bytes)
+            self.retained.append(current - self.allocated_bytes)
+
+        self.ticks += 1
+        if self.tick_timer.durations[-1] > budget:
+            self.overruns += 1
+
+        if self.summary_interval is not None:
+            now = time.monotonic()
+            if now - self.last_summary >= self.summary_interval:
+                self.last_summary = now
+                self.logSummary()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        returns the rolling p50, p99 and max durations of each stage, in seconds,
+        and the number of iterations and overruns, and the memory allocated in them in bytes, if it is tracked
+        """
+        summary = {name: timer.statistics() for name, timer in self.stages.items()}
+        summary["overruns"] = {"ticks": self.ticks, "overruns": self.overruns}
+        if self.track_allocations and self.allocations:
+            summary["allocations"] = {"mean": sum(self.allocations) / len(self.allocations),
+                                      "max": max(self.allocations),
+                                      "retained": sum(self.retained) / len(self.retained)}
+        return summary
+
+    def logSummary(self):
+        stages = " ".join(f"{name}={timer.percentile(0.5) * 1000:.2f}/{timer.percentile(0.99) * 1000:.2f}"
+                          f"/{max(timer.durations, default=0) * 1000:.2f}ms"
+                          for name, timer in self.stages.items())
+        line = f"ticks={self.ticks} overruns={self.overruns} {stages}"
+        if self.track_allocations and self.allocations:
+            line += f" allocations={sum(self.allocations) / len(self.allocations) / 1024:.1f}KiB"
+        logging.info(f"tick profile (p50/p99/max): {line}")
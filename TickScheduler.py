@@ -0,0 +1,81 @@
+import time
+from collections import deque
+from typing import Callable, Deque
+
+
+class TickScheduler:
+    """
+    spaces the iterations of a control loop at a fixed period, against absolute deadlines from a monotonic clock,
+    so the time the work takes doesn't add up to the period, and the loop doesn't drift.
+
+    when an iteration runs late, the deadlines that were already missed are skipped,
+    and the late iteration stands in for them, instead of running several iterations back to back.
+
+    the sensors can be read at a lower rate than the control loop runs,
+    in which case only some of the iterations are due for reading them.
+    """
+
+    period: float
+    """
+    the interval in seconds between the deadlines of consecutive iterations
+    """
+
+    sensor_period: float
+    """
+    the interval in seconds between iterations that read the sensors
+    """
+
+    def __init__(self, period: float, sensor_period: float = 0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep, window: int = 100) -> None:
+        self.period = period
+        self.sensor_period = sensor_period
+        self.clock = clock
+        self.sleep = sleep
+        self.deadline = clock()
+        self.last_sensor_time = -float("inf")
+        self.ticks = 0
+        self.skipped = 0
+        self.tick_times: Deque[float] = deque([self.deadline], maxlen=window)
+
+    def sensorDue(self) -> bool:
+        """
+        returns whether the sensors should be read in the current iteration,
+        and if so, counts them as read
+        """
+        now = self.clock()
+        # allow half a period of jitter, so the sensors are read on the nearest iteration
+        if now - self.last_sensor_time < self.sensor_period - self.period / 2:
+            return False
+        self.last_sensor_time = now
+        return True
+
+    def wait(self) -> int:
+        """
+        wait until the deadline of the next iteration,
+        returns the number of iterations that were skipped because the loop fell behind
+        """
+        self.ticks += 1
+        self.deadline += self.period
+        now = self.clock()
+
+        skipped = 0
+        if now < self.deadline:
+            self.sleep(self.deadline - now)
+        else:
+            # merge all of the missed iterations into the one starting now,
+            # and keep the next deadlines aligned with the original ones
+            skipped = int((now - self.deadline) // self.period)
+            self.deadline += skipped * self.period
+            self.skipped += skipped
+
+        self.tick_times.append(max(now, self.deadline))
+        return skipped
+
+    def achievedRate(self) -> float:
+        """
+        returns the rate, in iterations per second, that the latest iterations actually ran at
+        """
+        if len(self.tick_times) < 2:
+            return 0
+        return (len(self.tick_times) - 1) / (self.tick_times[-1] - self.tick_times[0])
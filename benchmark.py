@@ -0,0 +1,378 @@
+"""
+benchmarks for the path finding algorithm, at three levels:
+
+micro:    the geometry primitives, Vec2, Quaternion and the colision checks
+stage:    each stage of an iteration of the algorithm, over synthetic point clouds of increasing size
+reaction: how long the simulated drone takes to respond and to turn towards a new goal, with position and velocity commands
+mission:  complete flights with findPath and findTaxicabPath against the simulated client
+
+usage:
+    python benchmark.py run [--levels micro stage reaction mission] [--sizes 1000 10000] [-o results.json]
+    python benchmark.py compare baseline.json results.json [--threshold 0.1]
+"""
+import argparse
+import itertools
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import DroneTypes
+from DroneClient import DroneClient
+from quat import Quaternion
+from SimDroneClient import CityMap, SimDroneClient
+from TangentBug import TangentBug
+from vec2 import *
+
+Results = Dict[str, Dict[str, float]]
+
+
+def measure(func: Callable[[], object], repeat: int = 5, number: Optional[int] = None) -> Dict[str, float]:
+    """
+    time the function, running it number times in each of the repeats,
+    returns the best and median time of a single call, in seconds.
+    if the number isn't given, it is chosen so each repeat takes about 0.05 seconds
+    """
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - start > 0.05 or number >= 1 << 20:
+                break
+            number *= 4
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {"best": min(times), "median": statistics.median(times), "number": number}
+
+
+class SyntheticClient(DroneClient):
+    """
+    a client that always reports the same pose and the same point cloud,
+    for measuring the stages of the algorithm in isolation
+    """
+
+    def __init__(self, points: List[float], plane: float = -50) -> None:
+        self.future = None
+        self.pose = DroneTypes.Pose()
+        # the drone is on the plane, so the returns around it are ingested
+        self.pose.pos.z_m = plane
+        self.point_cloud = DroneTypes.PointCloud()
+        self.point_cloud.points = points
+
+    def __del__(self):
+        pass
+
+    def getPose(self):
+        return self.pose
+
+    def getLidarData(self):
+        return self.point_cloud
+
+    def flyToPosition(self, x: float, y: float, z: float, v: float):
+        pass
+
+    def flushCommands(self, force: bool = False):
+        pass
+
+    def flyWithVelocity(self, vx: float, vy: float, z: float, duration: float):
+        pass
+
+
+def syntheticCloud(size: int, seed: int = 0) -> List[float]:
+    """
+    a point cloud in body frame of the given number of points, mostly on walls around the drone,
+    with some scattered clutter, all within the sensor range
+    """
+    rng = np.random.default_rng(seed)
+    walls = int(size * 0.8)
+    clutter = size - walls
+
+    # walls are segments of random length and direction, starting within the sensor range
+    wall_count = max(1, size // 2000)
+    starts = rng.uniform(-25, 25, (wall_count, 2))
+    angles = rng.uniform(0, 2 * math.pi, wall_count)
+    lengths = rng.uniform(10, 30, wall_count)
+    which = rng.integers(0, wall_count, walls)
+    t = rng.uniform(0, 1, walls) * lengths[which]
+    wall_points = starts[which] + np.stack((np.cos(angles[which]), np.sin(angles[which])), axis=1) * t[:, None]
+
+    radius = np.sqrt(rng.uniform(4, 33 ** 2, clutter))
+    theta = rng.uniform(0, 2 * math.pi, clutter)
+    clutter_points = np.stack((radius * np.cos(theta), radius * np.sin(theta)), axis=1)
+
+    points = np.concatenate((wall_points, clutter_points))
+    heights = rng.uniform(-1, 1, (len(points), 1))
+    return np.concatenate((points, heights), axis=1).reshape(-1).tolist()
+
+
+def benchmarkMicro(results: Results):
+    a = Vec2(3.5, -2.25)
+    b = Vec2(-7.0, 11.5)
+    q = Quaternion.from_euler_angles(0.1, -0.05, 1.2)
+    p = Quaternion(1.0, 2.0, 3.0, 0)
+
+    results["micro/vec2.add"] = measure(lambda: a + b)
+    results["micro/vec2.rotate"] = measure(lambda: a.rotate(0.3))
+    results["micro/vec2.angle"] = measure(lambda: a.angle(b))
+    results["micro/vec2.distance"] = measure(lambda: a.distance(b))
+    results["micro/vec2.round"] = measure(lambda: a.round())
+    results["micro/quat.mul"] = measure(lambda: q * p * q.conjugate())
+    results["micro/quat.from_euler_angles"] = measure(
+        lambda: Quaternion.from_euler_angles(0.1, -0.05, 1.2))
+    results["micro/quat.rotation_matrix"] = measure(lambda: q.rotation_matrix())
+    results["micro/checkoverlapCircle"] = measure(
+        lambda: checkoverlapCircle(Vec2(0, 0), b, a, 3))
+
+    centers = Vec2Array(np.random.default_rng(0).uniform(-35, 35, 1000),
+                        np.random.default_rng(1).uniform(-35, 35, 1000))
+    results["micro/checkoverlapCircles.1000"] = measure(
+        lambda: checkoverlapCircles(Vec2(0, 0), b, centers, 3))
+
+
+def benchmarkStages(results: Results, sizes: List[int]):
+    for size in sizes:
+        client = SyntheticClient(syntheticCloud(size))
+        bug = TangentBug(client, -50)
+        random.seed(size)
+        bug.setGoal(Vec2(60, 5))
+        bug.updateEnvironment()
+
+        # pick a goal that is blocked, so the obstacle queries have work to do
+        for _ in range(20):
+            if bug.checkObstaclesInPath():
+                break
+            bug.setGoal(Vec2(random.uniform(-60, 60), random.uniform(-60, 60)))
+            bug.updateEnvironment()
+
+        suffix = f".{size}"
+        repeat = 3 if size >= 50000 else 5
+
+        point_cloud = client.getLidarData().points
+        if size <= 20000:
+            results[f"stage/detectObstacles{suffix}"] = measure(
+                lambda: list(bug.detectObstacles(point_cloud)), repeat=repeat)
+        results[f"stage/detectObstaclesBatch{suffix}"] = measure(
+            lambda: bug.detectObstaclesBatch(point_cloud), repeat=repeat)
+
+        results[f"stage/updateEnvironment{suffix}"] = measure(
+            bug.updateEnvironment, repeat=repeat)
+        results[f"stage/findCorridorWidth{suffix}"] = measure(
+            bug.findCorridorWidth, repeat=repeat)
+
+        def blockingObstacle():
+            # the colision checks are only done once per iteration, which is part of the cost
+            bug.cache.clear()
+            return bug.getBlockingObstacle(bug.goal)
+
+        def discontinuityPoints():
+            bug.cache.clear()
+            return bug.findDiscontinuityPoints()
+
+        def followBoundarySteps():
+            planner = bug.followBoundary()
+            for _ in range(5):
+                next(planner, None)
+
+        results[f"stage/getBlockingObstacle{suffix}"] = measure(
+            blockingObstacle, repeat=repeat)
+        results[f"stage/findDiscontinuityPoints{suffix}"] = measure(
+            discontinuityPoints, repeat=repeat)
+        results[f"stage/followBoundary.5steps{suffix}"] = measure(
+            followBoundarySteps, repeat=repeat)
+
+        def tick():
+            bug.updateEnvironment()
+            next(bug.motionToGoal(), None)
+
+        tick_time = measure(tick, repeat=repeat)
+        # the fraction of the iteration interval the work of a single iteration takes
+        tick_time["budget"] = tick_time["best"] / bug.time_step
+        results[f"stage/tick{suffix}"] = tick_time
+
+        results[f"stage/nearby_points{suffix}"] = {"count": len(bug.nearby_points)}
+
+
+def reactionTime(velocity_control: bool, turn: float = math.pi / 2, tolerance: float = math.radians(10),
+                 response_velocity: float = 1) -> Tuple[float, float]:
+    """
+    fly the simulated drone at its cruising velocity in an empty city, then turn the goal by the given angle,
+    returns the time in seconds from the turn untill the velocity of the drone changed towards the new direction
+    by the response velocity, and untill the drone flies within the tolerance of the new direction.
+    the simulation runs in lockstep with the iterations, so the result doesn't depend on the speed of the machine
+    """
+    plane = -50
+    client = SimDroneClient(CityMap(np.empty((0, 5))))
+    client.setAtPosition(0, 0, plane)
+    clock = client.lockstep()
+    bug = TangentBug(client, plane, clock=clock)
+    bug.velocity_control = velocity_control
+    bug.setGoal(Vec2(1000, 0))
+
+    def tick():
+        clock.sleep(bug.time_step)
+        bug.updateEnvironment()
+        point = next(bug.motionToGoal(), None)
+        bug.autoFlyTo(point if point is not None else Vec2(0, 0))
+
+    for _ in range(round(5 / bug.time_step)):
+        tick()
+
+    direction = Vec2(1, 0).rotate(turn)
+    bug.setGoal(bug.position + direction * 1000)
+    cruise_velocity = Vec2(client.velocity[0], client.velocity[1])
+    start = clock.now()
+    response = math.nan
+    while clock.now() - start < 10:
+        tick()
+        velocity = Vec2(client.velocity[0], client.velocity[1])
+        if math.isnan(response) and (velocity - cruise_velocity).dot(direction) >= response_velocity:
+            response = clock.now() - start
+        if abs(velocity.angle(direction)) <= tolerance:
+            break
+    return response, clock.now() - start
+
+
+def benchmarkReaction(results: Results):
+    for name, velocity_control in (("position", False), ("velocity", True)):
+        for turn_name, turn in (("turn", math.pi / 2), ("reverse", math.pi)):
+            response, turned = reactionTime(velocity_control, turn=turn)
+            results[f"reaction/{turn_name}.{name}"] = {"response": response, "time": turned}
+
+
+def benchmarkMissions(results: Results):
+    start = Vec2(-170, -980)
+    plane = -50
+    route = [Vec2(-320, -650), Vec2(-170, -980), Vec2(-330, -860)]
+    missions = {
+        "findPath": lambda bug: bug.findPath(Vec2(-330, -860)),
+        "findTaxicabPath": lambda bug: bug.findTaxicabPath(Vec2(-320, -650)),
+        # the same route, stopping at each goal, and passing through them
+        "route.sequential": lambda bug: [bug.findTaxicabPath(goal) for goal in route],
+        "route.pipelined": lambda bug: bug.flyMission(route),
+    }
+    variants = {"": False, ".velocity": True}
+
+    for (name, mission), (variant, velocity_control) in itertools.product(missions.items(), variants.items()):
+        client = SimDroneClient()
+        client.setAtPosition(start.x, start.y, plane)
+        # the simulation runs in lockstep with the iterations,
+        # so the missions take as long as computing them, and always fly the same way
+        clock = client.lockstep()
+        bug = TangentBug(client, plane, clock=clock)
+        bug.velocity_control = velocity_control
+
+        sim_start = clock.now()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        mission(bug)
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+
+        # each iteration that reads the sensors scans once
+        ticks = max(client.scans, 1)
+        results[f"mission/{name}{variant}"] = {"best": wall_time,
+                                               "sim_time": clock.now() - sim_start,
+                                               "cpu": cpu_time,
+                                               "ticks": ticks,
+                                               "cpu_per_tick": cpu_time / ticks,
+                                               "colisions": client.colisions,
+                                               "distance": client.distance_travelled,
+                                               "commands_sent": client.coalescer.sent,
+                                               "commands_skipped": client.coalescer.skipped,
+                                               **{f"cache_hit_rate/{query}": rate
+                                                  for query, rate in bug.cache.hitRates().items()}}
+
+
+def run(args):
+    results: Results = {}
+    if "micro" in args.levels:
+        benchmarkMicro(results)
+    if "stage" in args.levels:
+        benchmarkStages(results, args.sizes)
+    if "reaction" in args.levels:
+        benchmarkReaction(results)
+    if "mission" in args.levels:
+        benchmarkMissions(results)
+
+    output = {"meta": {"python": platform.python_version(),
+                       "numpy": np.__version__,
+                       "machine": platform.machine(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": results}
+
+    for name, result in results.items():
+        print(f"{name:60} " + " ".join(f"{k}={v:.6g}" for k, v in result.items()))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+
+
+def compare(args) -> int:
+    """
+    compare the best times of two runs, flagging the benchmarks that got slower by more than the threshold.
+    returns the number of regressions
+    """
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        if "best" not in baseline[name] or "best" not in current[name]:
+            continue
+        ratio = current[name]["best"] / baseline[name]["best"]
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "improved"
+        print(f"{name:60} {baseline[name]['best']:12.6g} {current[name]['best']:12.6g} {ratio:7.2f}x {flag}")
+
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{name:60} only in {'baseline' if name in baseline else 'current'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks for the path finding algorithm")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--levels", nargs="+", default=["micro", "stage", "reaction", "mission"],
+                            choices=["micro", "stage", "reaction", "mission"])
+    run_parser.add_argument("--sizes", nargs="+", type=int,
+                            default=[1000, 10000, 50000, 200000],
+                            help="the number of points in the synthetic clouds of the stage benchmarks")
+    run_parser.add_argument("-o", "--output", help="the json file to write the results to")
+
+    compare_parser = commands.add_parser("compare", help="compare the results of two runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="the relative slowdown that counts as a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(1 if compare(args) else 0)
+
+
+if __name__ == "__main__":
+    main()
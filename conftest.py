@@ -0,0 +1 @@
+# the modules are at the top of the repository, so the tests import them from here
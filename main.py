@@ -1,18 +1,27 @@
+from Clock import WALL_CLOCK
 from DroneClient import DroneClient
 from DroneTypes import *
 from vec2 import *
 import logging
-import time
-from TangentBug import TangentBug
+from Fleet import Fleet
+from PersistentMap import PersistentMap
 
 logging.basicConfig(level=logging.DEBUG)
 
 
 if __name__ == "__main__":
-    client = DroneClient()
-    client.connect()
+    # the names of the vehicles in the airsim settings to fly at once,
+    # an empty name is the default vehicle
+    vehicle_names = [""]
+    clients = {name: DroneClient(vehicle_name=name) for name in vehicle_names}
+    for client in clients.values():
+        client.connect()
+        print(client.isConnected())
 
-    print(client.isConnected())
+    # run the simulation in lockstep with the algorithm, as fast as it can compute it,
+    # instead of in real time. only possible with a single vehicle
+    lockstep = False
+    clock = next(iter(clients.values())).lockstep() if lockstep else WALL_CLOCK
 
     # the plane on the z axis in which all the positions are found
     plane = -50
@@ -27,10 +36,21 @@ if __name__ == "__main__":
         Vec2(-600, -1100)
     ]
 
-    time.sleep(2)
-    client.setAtPosition(positions[0].x, positions[0].y, plane)
-    time.sleep(1)
+    # each vehicle flies through the positions starting from a different one
+    routes = {name: positions[i:] + positions[:i] for i, name in enumerate(vehicle_names)}
 
-    bug = TangentBug(client, plane)
-    for p in positions[1:]:
-        bug.findTaxicabPath(p)
+    clock.sleep(2)
+    for name, route in routes.items():
+        clients[name].setAtPosition(route[0].x, route[0].y, plane)
+    clock.sleep(1)
+
+    # obstacles learned on previous missions at the same plane
+    obstacle_map = PersistentMap(f"obstacles_{-plane}.map", plane)
+
+    fleet = Fleet(plane, obstacle_map, clock)
+    for name, client in clients.items():
+        fleet.add(name, client)
+    try:
+        fleet.fly({name: route[1:] for name, route in routes.items()})
+    finally:
+        obstacle_map.save()
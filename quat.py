@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 import math
+from typing import Tuple
 
 # a minimal implementation of quaternions, based on the airsim implementation,
 # which is just enough to implement rotations.
@@ -41,3 +42,13 @@ class Quaternion:
 
     def conjugate(self):
         return Quaternion(-self.x, -self.y, -self.z, self.w)
+
+    def rotation_matrix(self) -> Tuple[Tuple[float, float, float], ...]:
+        """
+        returns the 3x3 matrix, as rows, which rotates a vector the same way as q * v * q.conjugate(),
+        allowing many vectors to be rotated at once without going through quaternion multiplication
+        """
+        x, y, z, w = self.x, self.y, self.z, self.w
+        return ((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)),
+                (2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)),
+                (2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)))
@@ -0,0 +1,202 @@
+"""
+runs findTaxicabPath missions against the simulated client for every combination of the given values
+of the constants of the algorithm, spread over a pool of processes, and prints a table of the results.
+
+each process keeps its own simulated client, and every mission runs in lockstep with the simulation,
+so the results don't depend on how busy the machine is.
+
+usage:
+    python sweep.py --param boundary_distance=3,4,5 --param max_ubran_velocity=8,10 [--seeds 0 1] [-o results.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from Clock import LockstepClock
+from SimDroneClient import CityMap, SimDroneClient
+from TangentBug import TangentBug
+from vec2 import Vec2
+
+# pairs of start and goal, along the route flown by main
+MISSIONS: List[Tuple[Vec2, Vec2]] = [
+    (Vec2(-170, -980), Vec2(-320, -650)),
+    (Vec2(-320, -650), Vec2(-580, -430)),
+    (Vec2(-580, -430), Vec2(-550, -700)),
+    (Vec2(-550, -700), Vec2(-1090, -955)),
+    (Vec2(-1090, -955), Vec2(-600, -1100)),
+]
+
+PLANE = -50
+
+Params = Dict[str, float]
+
+
+class MissionTimeout(Exception):
+    """
+    raised when a mission takes longer than its time limit, in simulated time
+    """
+
+
+class LimitedClock(LockstepClock):
+    """
+    a lockstep clock which stops the mission once the simulated time passes the time limit
+    """
+
+    def __init__(self, limit: float) -> None:
+        super().__init__()
+        self.limit = limit
+
+    def sleep(self, duration: float):
+        super().sleep(duration)
+        if self.time > self.limit:
+            raise MissionTimeout(f"the mission took longer than {self.limit} seconds")
+
+
+# the simulated client of the current worker process, and the cities it was given, by their seeds
+worker_client: Optional[SimDroneClient] = None
+worker_cities: Dict[int, CityMap] = {}
+
+
+def runMission(params: Params, seed: int, mission: int, timeout: float) -> Dict[str, float]:
+    """
+    fly a single mission with the given values of the constants, in the city generated from the seed,
+    returns the measurements of the mission
+    """
+    global worker_client
+    if seed not in worker_cities:
+        worker_cities[seed] = CityMap.generate(seed=seed)
+    if worker_client is None:
+        worker_client = SimDroneClient(worker_cities[seed])
+    client = worker_client
+    client.city = worker_cities[seed]
+
+    start, goal = MISSIONS[mission]
+    client.setAtPosition(start.x, start.y, PLANE)
+    clock = client.lockstep(LimitedClock(timeout))
+    colisions = client.colisions
+    distance = client.distance_travelled
+    scans = client.scans
+
+    # the constants are overriden on a subclass, since some are used while constructing the algorithm
+    bug_class = type("SweepTangentBug", (TangentBug,), dict(params))
+    bug = bug_class(client, PLANE, clock=clock)
+
+    reached = True
+    cpu_start = time.process_time()
+    try:
+        bug.findTaxicabPath(goal)
+    except MissionTimeout:
+        reached = False
+    cpu_time = time.process_time() - cpu_start
+
+    ticks = max(client.scans - scans, 1)
+    return {"reached": reached,
+            "time": clock.now(),
+            "colisions": client.colisions - colisions,
+            "distance": client.distance_travelled - distance,
+            "cpu_per_tick": cpu_time / ticks}
+
+
+def runRun(run: Tuple[Params, int, int, float]) -> Tuple[Params, int, int, Dict[str, float]]:
+    params, seed, mission, timeout = run
+    return params, seed, mission, runMission(params, seed, mission, timeout)
+
+
+def parseValue(kind: type, text: str) -> float:
+    """
+    parse the value of a constant, keeping the type of the constant,
+    since some are used as counts and indices
+    """
+    if kind is bool:
+        if text.lower() in ("true", "1"):
+            return True
+        if text.lower() in ("false", "0"):
+            return False
+        raise ValueError(f"expected true or false, got {text!r}")
+    return kind(text)
+
+
+def parseParam(text: str) -> Tuple[str, List[float]]:
+    name, _, values = text.partition("=")
+    # the constants are the numeric attributes of the algorithm, not its methods
+    kind = typing.get_type_hints(TangentBug).get(name)
+    if kind not in (bool, int, float) or not values:
+        raise argparse.ArgumentTypeError(f"expected a constant of TangentBug and its values, got {text!r}")
+    try:
+        return name, [parseValue(kind, value) for value in values.split(",")]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"expected {kind.__name__} values of {name}, got {values!r}") from e
+
+
+def summarize(runs: List[Tuple[Params, int, int, Dict[str, float]]]) -> List[Dict[str, float]]:
+    """
+    aggregate the runs of each combination of values over the missions and the cities
+    """
+    combinations: Dict[Tuple[Tuple[str, float], ...], List[Dict[str, float]]] = {}
+    for params, _, _, result in runs:
+        combinations.setdefault(tuple(sorted(params.items())), []).append(result)
+
+    rows = []
+    for params, results in combinations.items():
+        reached = [r for r in results if r["reached"]]
+        rows.append({**dict(params),
+                     "reached": len(reached) / len(results),
+                     "time": statistics.mean(r["time"] for r in reached) if reached else float("nan"),
+                     "colisions": sum(r["colisions"] for r in results),
+                     "distance": statistics.mean(r["distance"] for r in reached) if reached else float("nan"),
+                     "cpu_per_tick": statistics.mean(r["cpu_per_tick"] for r in results)})
+    # the safest combinations first, then the fastest
+    rows.sort(key=lambda row: (-row["reached"], row["colisions"], row["time"]))
+    return rows
+
+
+def printTable(rows: List[Dict[str, float]]):
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [max(len(column), 10) for column in columns]
+    print(" ".join(f"{column:>{width}}" for column, width in zip(columns, widths)))
+    for row in rows:
+        print(" ".join(f"{row[column]:>{width}.4g}" for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sweep the constants of the path finding algorithm")
+    parser.add_argument("--param", type=parseParam, action="append", default=[],
+                        help="a constant of TangentBug and the comma separated values to try, name=v1,v2")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0],
+                        help="the seeds of the cities to fly the missions in")
+    parser.add_argument("--missions", nargs="+", type=int, default=list(range(len(MISSIONS))),
+                        help="the indices of the missions to fly")
+    parser.add_argument("--timeout", type=float, default=300,
+                        help="the simulated time in seconds after which a mission counts as failed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-o", "--output", help="the json file to write the results of every run to")
+    args = parser.parse_args()
+
+    names = [name for name, _ in args.param]
+    grid = [dict(zip(names, values)) for values in itertools.product(*(values for _, values in args.param))]
+    runs = [(params, seed, mission, args.timeout)
+            for params in grid for seed in args.seeds for mission in args.missions]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        results = list(pool.map(runRun, runs))
+    print(f"{len(runs)} missions in {time.perf_counter() - start:.1f} seconds")
+
+    printTable(summarize(results))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump([{"params": params, "seed": seed, "mission": mission, **result}
+                       for params, seed, mission, result in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
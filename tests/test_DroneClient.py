@@ -0,0 +1,54 @@
+import pytest
+
+from Clock import Clock, LockstepClock
+from DroneClient import CommandCoalescer
+
+
+def test_similar_command_is_skipped():
+    clock = LockstepClock()
+    coalescer = CommandCoalescer(clock)
+    assert coalescer.accept(10, 0, -50, 10)
+    clock.sleep(0.1)
+    assert not coalescer.accept(10.1, 0, -50, 10)
+    assert coalescer.due(force=True) is None
+
+
+def test_stop_right_after_a_move_is_sent():
+    clock = LockstepClock()
+    coalescer = CommandCoalescer(clock)
+    assert coalescer.accept(10, 0, -50, 10)
+    clock.sleep(0.02)
+    assert coalescer.accept(0, 0, -50, 1e-5)
+    assert coalescer.last_command == (0, 0, -50, 1e-5)
+
+
+def test_command_held_back_is_sent_once_the_interval_passes():
+    clock = LockstepClock()
+    coalescer = CommandCoalescer(clock)
+    assert coalescer.accept(10, 0, -50, 10)
+    clock.sleep(0.02)
+    assert not coalescer.accept(0, 10, -50, 10)
+    assert coalescer.due() is None
+
+    clock.sleep(0.05)
+    assert coalescer.due() == (0, 10, -50, 10)
+    assert coalescer.due() is None
+    assert (coalescer.sent, coalescer.skipped) == (2, 0)
+
+
+def test_command_held_back_is_sent_when_forced():
+    clock = LockstepClock()
+    coalescer = CommandCoalescer(clock)
+    coalescer.accept(10, 0, -50, 10)
+    clock.sleep(0.02)
+    coalescer.accept(0, 10, -50, 10)
+    assert coalescer.due(force=True) == (0, 10, -50, 10)
+
+
+def test_clock_must_implement_now_and_sleep():
+    class NoSleep(Clock):
+        def now(self) -> float:
+            return 0
+
+    with pytest.raises(TypeError):
+        NoSleep()
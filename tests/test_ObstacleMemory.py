@@ -0,0 +1,55 @@
+import random
+
+from ObstacleMemory import ObstacleClusters
+from vec2 import Vec2
+
+
+def connectedGroups(points, connection_distance):
+    """
+    the groups of connected points, found by searching from every point
+    """
+    remaining = set(points)
+    groups = []
+    while remaining:
+        group = {remaining.pop()}
+        frontier = list(group)
+        while frontier:
+            p = frontier.pop()
+            linked = {q for q in remaining if p.distance(q) <= connection_distance}
+            remaining -= linked
+            group |= linked
+            frontier.extend(linked)
+        groups.append(group)
+    return groups
+
+
+def test_clusters_match_the_connected_points():
+    rng = random.Random(0)
+    clusters = ObstacleClusters(3)
+    points = set()
+    for _ in range(2000):
+        if points and rng.random() < 0.45:
+            point = rng.choice(sorted(points, key=lambda p: (p.x, p.y)))
+            points.discard(point)
+            clusters.remove(point)
+        else:
+            point = Vec2(rng.randint(0, 30), rng.randint(0, 30))
+            points.add(point)
+            clusters.add(point)
+
+        if rng.random() < 0.1:
+            for group in connectedGroups(points, 3):
+                assert len({clusters.label(p) for p in group}) == 1
+            labels = {clusters.label(p) for p in points}
+            assert len(labels) == len(connectedGroups(points, 3))
+
+
+def test_removing_a_point_inside_a_wall_doesnt_split():
+    clusters = ObstacleClusters(3)
+    wall = [Vec2(x, y) for x in range(100) for y in range(2)]
+    for point in wall:
+        clusters.add(point)
+    clusters.label(wall[0])
+
+    clusters.remove(Vec2(50, 0))
+    assert not clusters.split_clusters
@@ -0,0 +1,44 @@
+import numpy as np
+
+from PersistentMap import PersistentMap
+from vec2 import Vec2
+
+
+def test_removed_obstacle_is_forgotten(tmp_path):
+    path = str(tmp_path / "obstacles.map")
+    obstacle_map = PersistentMap(path, -50)
+    for _ in range(100):
+        obstacle_map.mark(np.array([[5, 5], [500, 500]]))
+    obstacle_map.save()
+
+    # the obstacle at (5, 5) is gone, the drone flies past it without detecting it, never going near (500, 500)
+    missions = 0
+    while len(obstacle_map.query(Vec2(0, 0), 20)) > 0:
+        obstacle_map.save()
+        missions += 1
+        assert missions <= obstacle_map.max_hits
+
+    reopened = PersistentMap(path, -50)
+    assert len(reopened.query(Vec2(0, 0), 20)) == 0
+    assert reopened.query(Vec2(500, 500), 1).tolist() == [[500, 500]]
+
+
+def test_detected_obstacle_is_kept(tmp_path):
+    path = str(tmp_path / "obstacles.map")
+    obstacle_map = PersistentMap(path, -50)
+    for _ in range(20):
+        obstacle_map.query(Vec2(0, 0), 20)
+        obstacle_map.mark(np.array([[5, 5]]))
+        obstacle_map.save()
+    assert obstacle_map.query(Vec2(0, 0), 20).tolist() == [[5, 5]]
+
+
+def test_fractional_plane_is_kept(tmp_path):
+    path = str(tmp_path / "obstacles.map")
+    obstacle_map = PersistentMap(path, -50.3)
+    for _ in range(3):
+        obstacle_map.mark(np.array([[5, 5]]))
+    obstacle_map.save()
+
+    reopened = PersistentMap(path, -50.3)
+    assert reopened.query(Vec2(0, 0), 20).tolist() == [[5, 5]]
@@ -0,0 +1,35 @@
+import itertools
+
+from RoadGraph import RoadGraph
+from vec2 import Vec2
+
+
+def emptyGraph() -> RoadGraph:
+    return RoadGraph(Vec2(-1181, -509), 170.7, 194.7, 20, 20)
+
+
+def test_empty_graph_routes_along_the_x_axis_then_the_y_axis():
+    graph = emptyGraph()
+    route = graph.route((0, 0), (3, 3))
+    assert graph.legs(route) == [[(0, 0), (1, 0), (2, 0), (3, 0)],
+                                 [(3, 0), (3, 1), (3, 2), (3, 3)]]
+
+
+def test_empty_graph_routes_turn_at_most_once():
+    graph = emptyGraph()
+    waypoints = list(itertools.product(range(7), range(7)))
+    for start, end in itertools.permutations(waypoints, 2):
+        legs = graph.legs(graph.route(start, end))
+        assert len(legs) <= 2, (start, end, legs)
+        if start[0] != end[0] and start[1] != end[1]:
+            # the corner is on the x axis of the start, like the routes flown before the times were learned
+            assert legs[0][-1] == (end[0], start[1])
+
+
+def test_slow_road_is_avoided():
+    graph = emptyGraph()
+    slow = graph.route((0, 0), (3, 0))
+    graph.record(slow, 1000)
+    route = graph.route((0, 0), (3, 0))
+    assert route != slow
+    assert route[0] == (0, 0) and route[-1] == (3, 0)
@@ -0,0 +1,30 @@
+from SensorLog import RecordingDroneClient, ReplayDroneClient, ReplayFinished
+from SimDroneClient import CityMap, SimDroneClient
+from TangentBug import TangentBug
+from vec2 import Vec2
+
+PLANE = -50
+
+
+def test_replay_remembers_the_obstacles_of_the_live_run(tmp_path):
+    client = SimDroneClient(CityMap.generate(seed=0))
+    client.setAtPosition(-170, -980, PLANE)
+    clock = client.lockstep()
+    recording = RecordingDroneClient(client, str(tmp_path / "flight"), clock=clock)
+    live = TangentBug(recording, PLANE, clock=clock)
+    # short enough for the obstacles seen first to be forgotten during the flight
+    live.memory_duration = 2
+    live.findPath(Vec2(-170, -940))
+    recording.close()
+
+    replay = ReplayDroneClient(str(tmp_path / "flight"))
+    replayed = TangentBug(replay, PLANE, clock=replay.clock)
+    replayed.memory_duration = 2
+    try:
+        while True:
+            replayed.updateEnvironment()
+    except ReplayFinished:
+        pass
+
+    assert len(live.obstacle_points) > 0
+    assert dict(replayed.obstacle_points.items()) == dict(live.obstacle_points.items())
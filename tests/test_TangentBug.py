@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+import pytest
+
+from ObstacleMemory import ObstacleMemory
+from PolarScan import PolarScan
+from quat import Quaternion
+from SimDroneClient import CityMap, SimDroneClient
+from TangentBug import TangentBug
+from vec2 import Vec2, Vec2Array, checkoverlapCircle, checkoverlapCircles
+
+PLANE = -50
+
+
+@pytest.mark.parametrize("filtered", [True, False])
+def test_batch_detection_matches_the_rounded_reference(filtered):
+    bug = TangentBug(SimDroneClient(CityMap.generate(seed=0)), PLANE)
+    bug.orientation3D = Quaternion.from_euler_angles(0.15, -0.1, 2.3)
+    bug.position = Vec2(-123.4, 56.7)
+    bug.height = PLANE + 0.4
+    if not filtered:
+        bug.ingestion_z_band = float("inf")
+        bug.ingestion_voxel_size = 0
+        bug.ingestion_point_budget = 0
+
+    rng = np.random.default_rng(0)
+    cloud = rng.uniform((-40, -40, -3), (40, 40, 3), (1000, 3)).ravel().tolist()
+
+    reference = [p.round() for p in bug.detectObstacles(cloud)]
+    batch = bug.detectObstaclesBatch(cloud)
+
+    assert len(reference) > 0
+    assert [(p.x, p.y) for p in reference] == [tuple(p) for p in batch.tolist()]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_batch_overlap_matches_the_single_circle_check(seed):
+    rng = np.random.default_rng(seed)
+    a, b = (Vec2(*rng.uniform(-20, 20, 2)) for _ in range(2))
+    xs, ys = rng.uniform(-30, 30, (2, 200))
+    radius = rng.uniform(0.5, 8)
+
+    overlapping, closest = checkoverlapCircles(a, b, Vec2Array(xs, ys), radius)
+
+    expected = [checkoverlapCircle(a, b, Vec2(x, y), radius) for x, y in zip(xs, ys)]
+    assert overlapping.tolist() == expected
+    if not any(expected):
+        assert closest is None
+    else:
+        distances = [Vec2(x, y).distance(a) if hit else float("inf") for x, y, hit in zip(xs, ys, expected)]
+        assert closest == int(np.argmin(distances))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_polar_corridor_width_matches_the_brute_force_width(seed):
+    rng = np.random.default_rng(seed)
+    points = np.round(rng.uniform(-15, 15, (int(rng.integers(1, 80)), 2)))
+    points = points[np.hypot(points[:, 0], points[:, 1]) > 1]
+    points = Vec2Array(points[:, 0], points[:, 1])
+    if len(points) == 0:
+        return
+
+    scan = PolarScan(points)
+    closest = scan.closestPoint()
+    width = scan.ranges[closest] + scan.closestOpposing(closest)
+
+    # the width as it was found before the scan, by going over every point
+    lengths = points.length()
+    nearest = int(np.argmin(lengths))
+    opposing = np.abs(points.angle_from(points[nearest])) > math.pi / 2
+    expected = lengths[nearest] + lengths[opposing].min(initial=math.inf)
+    assert width == pytest.approx(expected)
+
+
+def test_shared_memory_without_clusters_is_rejected():
+    client = SimDroneClient(CityMap.generate(seed=0))
+    with pytest.raises(ValueError):
+        TangentBug(client, PLANE, obstacle_points=ObstacleMemory())
+
+    shared = ObstacleMemory(TangentBug.memory_cell_size, TangentBug.connection_distance)
+    assert TangentBug(client, PLANE, obstacle_points=shared).obstacle_points is shared
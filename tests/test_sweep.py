@@ -0,0 +1,31 @@
+import argparse
+
+import pytest
+
+from sweep import parseParam, runMission
+
+
+def test_values_keep_the_type_of_the_constant():
+    assert parseParam("polar_bins=180,360") == ("polar_bins", [180, 360])
+    assert all(type(value) is int for value in parseParam("polar_bins=180,360")[1])
+    assert parseParam("colision_radius=3,3.5") == ("colision_radius", [3.0, 3.5])
+    assert parseParam("velocity_control=true,false") == ("velocity_control", [True, False])
+
+
+@pytest.mark.parametrize("text", ["findPath=1", "missing=1", "polar_bins=1.5", "velocity_control=maybe", "polar_bins="])
+def test_invalid_params_are_rejected(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parseParam(text)
+
+
+def test_mission_runs_with_an_int_override():
+    name, values = parseParam("polar_bins=180")
+    result = runMission({name: values[0]}, seed=0, mission=0, timeout=5)
+    assert result["colisions"] == 0
+    assert result["time"] > 0
+
+
+def test_mission_runs_with_ingestion_settings():
+    params = dict([parseParam("ingestion_point_budget=500"), parseParam("batched_ingestion=true")])
+    result = runMission({name: values[0] for name, values in params.items()}, seed=0, mission=0, timeout=5)
+    assert result["colisions"] == 0
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 import math
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Tuple, Union, overload
+
+import numpy as np
 
 
 @dataclass(unsafe_hash=True, frozen=True)
@@ -61,8 +63,12 @@ class Vec2:
         """
         rotate the vector by the angle, given in radians
         """
-        cos = math.cos(angle)
-        sin = math.sin(angle)
+        return self.rotateBy(math.cos(angle), math.sin(angle))
+
+    def rotateBy(self, cos: float, sin: float) -> "Vec2":
+        """
+        rotate the vector by the angle with the given cosine and sine
+        """
         return Vec2(self.x * cos - self.y * sin,
                     self.x * sin + self.y * cos)
 
@@ -88,6 +94,119 @@ class Vec2:
         return self / length
 
 
+class Vec2Array:
+    """
+    many vectors stored as a structure of arrays,
+    so that geometry over all of them is done in a single vectorized pass,
+    without creating a Vec2 for each one.
+
+    the operations match those of Vec2, applied to each vector in the array.
+    """
+    x: np.ndarray
+    y: np.ndarray
+
+    __slots__ = ['x', 'y']
+
+    def __init__(self, x: np.ndarray, y: np.ndarray) -> None:
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+
+    @staticmethod
+    def empty() -> "Vec2Array":
+        return Vec2Array(np.empty(0), np.empty(0))
+
+    @staticmethod
+    def from_points(points: Iterable[Vec2]) -> "Vec2Array":
+        points = list(points)
+        return Vec2Array(np.array([p.x for p in points], dtype=np.float64),
+                         np.array([p.y for p in points], dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __iter__(self) -> Iterator[Vec2]:
+        return map(Vec2, self.x.tolist(), self.y.tolist())
+
+    @overload
+    def __getitem__(self, index: int) -> Vec2: ...
+
+    @overload
+    def __getitem__(self, index: Union[slice, np.ndarray]) -> "Vec2Array": ...
+
+    def __getitem__(self, index):
+        """
+        returns a single vector for an integer index,
+        and the selected vectors for a slice, a boolean mask or an array of indices
+        """
+        if isinstance(index, (int, np.integer)):
+            return Vec2(float(self.x[index]), float(self.y[index]))
+        return Vec2Array(self.x[index], self.y[index])
+
+    def __add__(self, other: Vec2) -> "Vec2Array":
+        return Vec2Array(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other: Vec2) -> "Vec2Array":
+        return Vec2Array(self.x - other.x, self.y - other.y)
+
+    def __mul__(self, other: Union[float, np.ndarray]) -> "Vec2Array":
+        return Vec2Array(self.x * other, self.y * other)
+
+    def __neg__(self) -> "Vec2Array":
+        return Vec2Array(-self.x, -self.y)
+
+    def round(self) -> "Vec2Array":
+        return Vec2Array(np.round(self.x), np.round(self.y))
+
+    def dot(self, other: Vec2) -> np.ndarray:
+        return self.x * other.x + self.y * other.y
+
+    def length(self) -> np.ndarray:
+        return np.hypot(self.x, self.y)
+
+    def distance(self, other: Vec2) -> np.ndarray:
+        return np.hypot(other.x - self.x, other.y - self.y)
+
+    def signed_area(self, other: Vec2) -> np.ndarray:
+        return self.x * other.y - self.y * other.x
+
+    def angle(self, other: Vec2) -> np.ndarray:
+        """
+        find the angle from each vector to the other, in radians
+        """
+        return np.arctan2(self.signed_area(other), self.dot(other))
+
+    def angle_from(self, other: Vec2) -> np.ndarray:
+        """
+        find the angle from the other vector to each vector, in radians,
+        the same as other.angle(v) for each vector v
+        """
+        return np.arctan2(other.signed_area(self), other.dot(self))
+
+    def rotate(self, angle: Union[float, np.ndarray]) -> "Vec2Array":
+        """
+        rotate the vectors by the angle, given in radians,
+        or by a different angle for each vector
+        """
+        return self.rotateBy(np.cos(angle), np.sin(angle))
+
+    def rotateBy(self, cos: Union[float, np.ndarray], sin: Union[float, np.ndarray]) -> "Vec2Array":
+        """
+        rotate the vectors by the angle with the given cosine and sine,
+        or by a different angle for each vector
+        """
+        return Vec2Array(self.x * cos - self.y * sin,
+                         self.x * sin + self.y * cos)
+
+    def argmin(self, values: np.ndarray) -> Optional[int]:
+        """
+        returns the index of the vector with the smallest given value,
+        or None if there are no vectors
+        """
+        if len(values) == 0:
+            return None
+        return int(np.argmin(values))
+
+
 def getFoVCoverage(center: Vec2, radius: float) -> Optional[float]:
     """
     returns the angle of view ocluded by the half circle,
@@ -124,3 +243,36 @@ def checkoverlapCircle(a: Vec2, b: Vec2, o: Vec2, radius: float) -> bool:
     # if the points are on oposite sides, the angle between them would be pi
     # and 0 if they are on the same side
     return abs((b - p).angle(a - p)) > math.pi / 2
+
+
+def segmentDistances(a: Vec2, b: Vec2, points: Vec2Array) -> np.ndarray:
+    """
+    returns the distance of each of the points from the segment (a,b)
+    """
+    line = b - a
+    offsets = points - a
+    squared_length = line.dot(line)
+
+    # find the point on the segment closest to each point,
+    # by clamping the projection of the point onto the line to the ends of the segment
+    if squared_length < 0.0001:
+        # the segment is so short it is just the point a
+        t = np.zeros(len(points))
+    else:
+        t = np.clip(offsets.dot(line) / squared_length, 0, 1)
+    return np.hypot(offsets.x - t * line.x, offsets.y - t * line.y)
+
+
+def checkoverlapCircles(a: Vec2, b: Vec2, centers: Vec2Array, radius: float) -> Tuple[np.ndarray, Optional[int]]:
+    """
+    checks which of the circles around the given centers the segment (a,b) overlaps with,
+    returns a mask of the overlapping circles,
+    and the index of the overlapping center closest to a, if there is one
+    """
+    overlapping = segmentDistances(a, b, centers) <= radius
+    if not overlapping.any():
+        return overlapping, None
+
+    lengths = np.where(overlapping, centers.distance(a), math.inf)
+    return overlapping, int(np.argmin(lengths))
+